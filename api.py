@@ -0,0 +1,115 @@
+from flask import Blueprint, abort, jsonify, request, url_for
+
+from extensions import db
+from media import media_server
+from models import Category, Post
+from page_cache import page_cache
+from pagination import keyset_paginate
+from rendering import get_post_html
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+PAGE_KEYS = [(Post.created_at, True), (Post.id, True)]
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def _time(value):
+    return value.isoformat() + 'Z' if value else None
+
+
+# Read-only representation of a post: field name -> value getter
+FIELDS = {
+    'id': lambda p: p.id,
+    'slug': lambda p: p.slug,
+    'title': lambda p: p.title,
+    'summary': lambda p: p.summary,
+    'url': lambda p: url_for('post', slug=p.slug, _external=True),
+    'category': lambda p: {'slug': p.category.slug, 'name': p.category.name} if p.category else None,
+    'author': lambda p: p.author_ref.username if p.author_ref else None,
+    'image_url': lambda p: url_for('static', filename='uploads/' + p.image_url, _external=True) if p.image_url else None,
+    'video_url': lambda p: media_server.url('videos', p.video_url) if p.video_url else None,
+    'audio_url': lambda p: media_server.url('audio', p.audio_url) if p.audio_url else None,
+    'created_at': lambda p: _time(p.created_at),
+    'updated_at': lambda p: _time(p.updated_at),
+    'views': lambda p: p.views or 0,
+    'likes': lambda p: p.likes or 0,
+    'word_count': lambda p: p.word_count,
+    'reading_time': lambda p: p.read_time,
+    'content': lambda p: p.content,
+    'content_html': get_post_html,
+}
+# List responses leave out the article body unless asked for (?fields=...)
+LIST_FIELDS = [name for name in FIELDS if name not in ('content', 'content_html')]
+
+
+def _fields(default):
+    requested = request.args.get('fields')
+    if not requested:
+        return default
+    fields = [f.strip() for f in requested.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown:
+        abort(400, description=f"Noma'lum maydon: {', '.join(unknown)}")
+    return fields
+
+
+def _options(fields):
+    options = [db.joinedload(Post.category), db.joinedload(Post.author_ref)]
+    if 'content_html' in fields:
+        options.append(db.undefer(Post.content_html))
+    elif 'content' not in fields:
+        options.append(db.defer(Post.content))
+    return options
+
+
+def _serialize(post, fields):
+    return {name: FIELDS[name](post) for name in fields}
+
+
+@api.route('/posts')
+@page_cache.cached()
+def posts():
+    fields = _fields(LIST_FIELDS)
+    limit = min(max(request.args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+    query = Post.query.options(*_options(fields))
+    category_slug = request.args.get('category')
+    if category_slug:
+        category = Category.query.filter_by(slug=category_slug).first_or_404()
+        query = query.filter(Post.category_id == category.id)
+    page = keyset_paginate(query, PAGE_KEYS, limit,
+                           after=request.args.get('after'), before=request.args.get('before'))
+    args = {k: v for k, v in request.args.items() if k not in ('after', 'before')}
+    return jsonify({
+        'posts': [_serialize(post, fields) for post in page.items],
+        'next': url_for('api.posts', after=page.next_cursor, _external=True, **args) if page.has_next else None,
+        'prev': url_for('api.posts', before=page.prev_cursor, _external=True, **args) if page.has_prev else None,
+    })
+
+
+@api.route('/posts/<slug>')
+@page_cache.cached()
+def post_detail(slug):
+    fields = _fields(list(FIELDS))
+    post = Post.query.options(*_options(fields)).filter_by(slug=slug).first_or_404()
+    return jsonify(_serialize(post, fields))
+
+
+@api.errorhandler(400)
+def bad_request(e):
+    return jsonify({'error': e.description}), 400
+
+
+@api.errorhandler(404)
+def not_found(e):
+    return jsonify({'error': 'Topilmadi'}), 404
+
+
+@api.after_request
+def conditional(response):
+    # Cached responses already carry an ETag; logged-in users get one here
+    # (compression, app-wide, turns it into one per coding)
+    if response.status_code == 200 and not response.get_etag()[0]:
+        response.add_etag()
+        response.make_conditional(request)
+    return response
@@ -1,12 +1,15 @@
-from flask import Flask, render_template, abort, redirect, url_for, request, flash, jsonify, current_app
+from flask import Flask, render_template, abort, redirect, url_for, request, flash, jsonify, current_app, g
 from urllib.parse import urlparse, urljoin
 import os
-import markdown
-import bleach
+import hmac
+import click
 from flask_login import login_user, login_required, logout_user, current_user
 from werkzeug.utils import secure_filename
+from flask_wtf.csrf import validate_csrf
+from wtforms.validators import ValidationError
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from sqlalchemy.dialects import postgresql, sqlite
 
 # Flask-Dance for OAuth
 from flask_dance.contrib.google import make_google_blueprint, google
@@ -14,8 +17,30 @@ from flask_dance.consumer import oauth_authorized
 from flask_dance.consumer.storage.sqla import SQLAlchemyStorage
 
 from extensions import db, login_manager, migrate, mail
-from models import User, Post, Category, Comment, Badge, Analytics, SiteSettings
+from models import User, Post, Category, Comment, Analytics, SiteSettings, post_like
 from forms import LoginForm, PostForm, CommentForm, ContactForm, RegistrationForm, UpdateAccountForm, SiteSettingsForm
+from rendering import render_markdown, prerender_post, get_post_html, html_version, text_stats
+from counters import view_counter
+from analytics import analytics_collector
+from search import search_posts, snippets, rebuild_index, index_complete
+from site_context import get_site_context, invalidate_site_context
+from page_cache import page_cache
+from pagination import keyset_paginate, cached_count
+from sqlstats import sql_stats, max_queries, QueryBudgetExceeded
+from metrics import metrics
+from uploads import chunked_uploads, UploadError
+from images import image_pipeline, IMAGE_EXTENSIONS
+from badges import badge_engine
+from related import update_related, remove_related, rebuild_related, related_posts
+from media import media_server
+from database import database_url, engine_options, sqlite_pragmas
+from api import api
+from compression import compressor, compress_static
+from export import export_static
+from importer import PostImporter
+from backup import export_data, import_data, RestoreError
+from ratelimit import rate_limiter
+from user_cache import user_cache
 
 # Load environment variables
 load_dotenv()
@@ -24,20 +49,66 @@ from werkzeug.middleware.proxy_fix import ProxyFix
 
 app = Flask(__name__)
 # Fix for Render (HTTPS) to ensure redirect_uris are https://
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+# (x_for: remote_addr is the client's IP, not the proxy's; rate limits key on it)
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
 
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'default-dev-key')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///blog.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url(os.getenv('DATABASE_URL', 'sqlite:///blog.db'))
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+    app.config['SQLALCHEMY_DATABASE_URI'],
+    pool_size=int(os.getenv('DB_POOL_SIZE', 5)),
+    max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 10)),
+    pool_timeout=int(os.getenv('DB_POOL_TIMEOUT', 30)),
+    pool_recycle=int(os.getenv('DB_POOL_RECYCLE', 1800)),
+)
+app.config['SQLITE_BUSY_TIMEOUT'] = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)) # ms to wait for the write lock
+app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'static/uploads')
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024 # 100MB limit
+app.config['UPLOAD_MAX_SIZE'] = int(os.getenv('UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024)) # chunked uploads, 2GB
+app.config['UPLOAD_CHUNK_SIZE'] = 8 * 1024 * 1024
+app.config['MEDIA_ACCEL_PREFIX'] = os.getenv('MEDIA_ACCEL_PREFIX') # nginx internal location for /media files
+app.config['MEDIA_X_SENDFILE'] = os.getenv('MEDIA_X_SENDFILE') == '1'
+app.config['VIEW_FLUSH_INTERVAL'] = int(os.getenv('VIEW_FLUSH_INTERVAL', 10)) # seconds
+app.config['ANALYTICS_FLUSH_INTERVAL'] = int(os.getenv('ANALYTICS_FLUSH_INTERVAL', 30)) # seconds
+app.config['PAGE_CACHE_SIZE'] = int(os.getenv('PAGE_CACHE_SIZE', 512)) # cached anonymous pages per worker
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 500)) # smaller responses are sent uncompressed
+app.config['RATE_LIMIT_ENABLED'] = os.getenv('RATE_LIMIT_ENABLED', '1') != '0'
+app.config['RATE_LIMITS'] = { # POSTs per client IP and per user, shared by all workers
+    'post': '5/minute', # comments
+    'like_post': '30/minute',
+    'login': '10/minute',
+    'register': '5/hour',
+    'contact': '3/hour',
+}
+app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', 60)) # seconds a logged-in user is served from memory
+app.config['SQL_QUERY_BUDGET'] = { # SQL statements per request: over budget logs a warning, fails `flask check-queries`
+    'index': 5,
+    'blog': 5,
+    'post': 8, # also comment POSTs
+    'admin_dashboard': 5,
+}
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN') # lets Prometheus scrape /admin/metrics
 
 # Initialize extensions
+sqlite_pragmas.init_app(app)
 db.init_app(app)
 migrate.init_app(app, db)
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 mail.init_app(app)
+view_counter.init_app(app)
+analytics_collector.init_app(app)
+page_cache.init_app(app)
+sql_stats.init_app(app)
+metrics.init_app(app)
+chunked_uploads.init_app(app)
+image_pipeline.init_app(app)
+media_server.init_app(app)
+compressor.init_app(app)
+rate_limiter.init_app(app)
+user_cache.init_app(app)
 
 # Google OAuth Blueprint
 google_bp = make_google_blueprint(
@@ -47,10 +118,12 @@ google_bp = make_google_blueprint(
     redirect_url='/login/google/authorized'
 )
 app.register_blueprint(google_bp, url_prefix='/login')
+app.register_blueprint(api)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    # Cached per worker for a short TTL, see user_cache.py
+    return user_cache.load(int(user_id))
 
 # Google OAuth signal handler
 @oauth_authorized.connect_via(google_bp)
@@ -109,6 +182,8 @@ def google_logged_in(blueprint, token):
                     streak=1
                 )
                 db.session.add(user)
+                db.session.flush()
+                check_badges(user, 'points', 0, user.points)
                 db.session.commit()
                 flash('Xush kelibsiz! Hisobingiz Google orqali yaratildi.', 'success')
         
@@ -129,9 +204,7 @@ def google_logged_in(blueprint, token):
         if user.points is None: 
             user.points = 0
             db.session.commit()
-            
-        check_badges(user)
-        db.session.commit()
+        user_cache.invalidate(user.id)
         
         flash(f'Xush kelibsiz, {user.username}!', 'success')
         return redirect(url_for('index'))
@@ -154,23 +227,61 @@ def is_safe_url(target):
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg', 'webp'}
 
+# Listing order / keyset for cursor pagination (newest first, id breaks ties)
+POST_KEYS = [(Post.created_at, True), (Post.id, True)]
+
+def listing_options():
+    # Eager-load what post cards show, instead of one lazy load per card
+    # (not the article text: cards use the stored summary and reading time)
+    return (db.defer(Post.content),
+            db.joinedload(Post.category),
+            db.joinedload(Post.author_ref))
+
+def paginate_posts(query, per_page, total=None, ranked_by=None):
+    # Cursor (?after= / ?before=) pagination; old ?page= links still use OFFSET
+    query = query.options(*listing_options())
+    page = request.args.get('page', type=int)
+    if page:
+        posts = query.order_by(Post.created_at.desc()).paginate(page=page, per_page=per_page, count=False)
+        posts.total = total
+        return posts
+    keys = ([(ranked_by, False)] if ranked_by is not None else []) + POST_KEYS
+    return keyset_paginate(query, keys, per_page, total=total,
+                           after=request.args.get('after'), before=request.args.get('before'))
+
+# Comments, newest first, a page at a time (see post_comments)
+COMMENT_KEYS = [(Comment.created_at, True), (Comment.id, True)]
+COMMENTS_PER_PAGE = 20
+
+def comment_page(post_id, after=None):
+    query = Comment.query.filter_by(post_id=post_id) \
+        .options(db.joinedload(Comment.author_ref))
+    return keyset_paginate(query, COMMENT_KEYS, COMMENTS_PER_PAGE, after=after)
+
+def count_comments(post_id, delta):
+    # Keeps post.comment_count in step; not an edit, so updated_at stays
+    db.session.execute(
+        db.update(Post).where(Post.id == post_id)
+        .values(comment_count=db.func.coalesce(Post.comment_count, 0) + delta, updated_at=Post.updated_at)
+    )
+
 # --- Context Processors ---
 @app.context_processor
 def inject_categories():
-    settings = SiteSettings.get_settings()
-    return dict(categories=Category.query.all(), site_settings=settings)
+    # Cached per worker, invalidated via a shared version stamp
+    return get_site_context()
 
 # --- Routes ---
 
 @app.route('/')
+@page_cache.cached()
 def index():
-    page = request.args.get('page', 1, type=int)
-    posts = Post.query.order_by(Post.created_at.desc()).paginate(page=page, per_page=6)
+    posts = paginate_posts(Post.query, per_page=6)
     return render_template('index.html', posts=posts)
 
 @app.route('/blog')
+@page_cache.cached()
 def blog():
-    page = request.args.get('page', 1, type=int)
     category_slug = request.args.get('category')
     search_query = request.args.get('q')
     
@@ -180,44 +291,73 @@ def blog():
         category = Category.query.filter_by(slug=category_slug).first_or_404()
         query = query.filter_by(category_id=category.id)
     
+    rank = None
     if search_query:
-        query = query.filter(Post.title.contains(search_query) | Post.content.contains(search_query))
+        # Full-text search (FTS5), ranked by BM25
+        query, rank = search_posts(query, search_query)
         
-    posts = query.order_by(Post.created_at.desc()).paginate(page=page, per_page=9)
-    return render_template('blog.html', posts=posts, search_query=search_query)
+    total = cached_count(query, ('blog', category_slug, search_query))
+    posts = paginate_posts(query, per_page=9, total=total, ranked_by=rank)
+    highlights = snippets(posts.items, search_query) if search_query else {}
+    return render_template('blog.html', posts=posts, search_query=search_query, highlights=highlights)
 
 @app.route('/post/<slug>', methods=['GET', 'POST'])
+@page_cache.cached(on_hit=lambda meta: view_counter.increment(meta['post_id']), csrf_cookie=True)
 def post(slug):
-    post = Post.query.filter_by(slug=slug).first_or_404()
+    post = Post.query.options(db.joinedload(Post.category)).filter_by(slug=slug).first_or_404()
     
-    # Increment views
-    post.views += 1
-    db.session.commit()
+    # Buffered in memory and flushed in batches by the view counter
+    view_counter.increment(post.id)
+    if 'page_cache_meta' in g:
+        g.page_cache_meta['post_id'] = post.id
     
-    # Convert markdown
-    md = markdown.Markdown(extensions=['fenced_code', 'codehilite'])
-    content = md.convert(post.content)
-    # Sanitize HTML
-    allowed_tags = ['p', 'h1', 'h2', 'h3', 'h4', 'ul', 'ol', 'li', 'a', 'strong', 'em', 'code', 'pre', 'img', 'blockquote']
-    allowed_attrs = {'*': ['class'], 'a': ['href', 'rel'], 'img': ['src', 'alt']}
-    clean_content = bleach.clean(content, tags=allowed_tags, attributes=allowed_attrs)
+    # Sanitized HTML, pre-rendered on save and cached per worker
+    clean_content = get_post_html(post)
     
     # Comments
     form = CommentForm()
     if form.validate_on_submit():
         comment = Comment(author_name=form.author.data, content=form.content.data, post_id=post.id)
+        if current_user.is_authenticated:
+            comment.user_id = current_user.id
         db.session.add(comment)
+        count_comments(post.id, 1)
         db.session.commit()
+        page_cache.invalidate()
         flash('Izoh qoldirildi!', 'success')
         return redirect(url_for('post', slug=post.slug))
         
-    comments = Comment.query.filter_by(post_id=post.id).order_by(Comment.created_at.desc()).all()
+    # First page inline; the rest come from post_comments
+    comments = comment_page(post.id)
     
-    # Related posts
-    related = Post.query.filter(Post.category_id == post.category_id, Post.id != post.id).limit(3).all()
+    # Related posts, precomputed on save (see related.py)
+    related = related_posts(post)
     
     return render_template('post.html', post=post, content=clean_content, form=form, comments=comments, related=related)
 
+@app.route('/post/<slug>/comments')
+@page_cache.cached()
+def post_comments(slug):
+    # Next page of comments after the ?after= cursor: an HTML fragment for
+    # the post page, or JSON with ?format=json
+    post_id = db.session.scalar(db.select(Post.id).where(Post.slug == slug))
+    if post_id is None:
+        abort(404)
+    comments = comment_page(post_id, after=request.args.get('after'))
+    next_url = url_for('post_comments', slug=slug, after=comments.next_cursor,
+                       format=request.args.get('format')) if comments.has_next else None
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'comments': [{
+                'id': c.id,
+                'author': c.author_name or (c.author_ref.username if c.author_ref else None),
+                'content': c.content,
+                'created_at': c.created_at.isoformat() + 'Z' if c.created_at else None,
+            } for c in comments.items],
+            'next': next_url,
+        })
+    return render_template('_comments.html', comments=comments.items, next_url=next_url)
+
 @app.route('/about')
 def about():
     return render_template('about.html')
@@ -232,50 +372,63 @@ def contact():
     return render_template('contact.html', form=form)
 
 # --- Gamification Logic ---
-def check_badges(user):
-    # Badge 1: First Step (1 point)
-    if user.points >= 1:
-        badge = Badge.query.filter_by(name='Boshlang\'ich').first()
-        if not badge:
-            badge = Badge(name='Boshlang\'ich', description='Ilk qadam!', icon='footprints', criteria='points_1')
-            db.session.add(badge)
-            db.session.commit()
-            
-        if badge not in user.badges:
-            user.badges.append(badge)
-            flash(f"Tabriklaymiz! Siz '{badge.name}' nishonini oldingiz!", 'success')
-
-    # Badge 2: Reader (5 posts read = 5 points approx)
-    if user.points >= 10:
-         badge = Badge.query.filter_by(name='Kitobxon').first()
-         if not badge:
-            badge = Badge(name='Kitobxon', description='10 ta maqola o\'qildi', icon='book-open', criteria='points_10')
-            db.session.add(badge)
-            db.session.commit()
-            
-         if badge not in user.badges:
-            user.badges.append(badge)
-            flash(f"Tabriklaymiz! Siz '{badge.name}' nishonini oldingiz!", 'success')
-            
-    db.session.commit()
+def check_badges(user, metric, old, new):
+    # Rules live in badges.py; only thresholds crossed by old -> new are checked
+    for rule in badge_engine.evaluate(user, metric, old, new):
+        flash(f"Tabriklaymiz! Siz '{rule.name}' nishonini oldingiz!", 'success')
 
 # --- Auth Routes ---
 
 @app.route('/post/<slug>/like', methods=['POST'])
 @login_required
 def like_post(slug):
-    post = Post.query.filter_by(slug=slug).first_or_404()
-    
-    # Increment post likes
-    post.likes = (post.likes or 0) + 1
+    post_id = db.session.scalar(db.select(Post.id).filter_by(slug=slug))
+    if post_id is None:
+        abort(404)
+
+    # The (user_id, post_id) primary key makes a second like a no-op. ON
+    # CONFLICT rather than a savepoint: pysqlite commits a savepoint opened
+    # before the transaction's first write, so the like would survive a
+    # failed counter update
+    insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+    liked = db.session.scalar(
+        insert(post_like).values(user_id=current_user.id, post_id=post_id)
+        .on_conflict_do_nothing().returning(post_like.c.post_id))
+    if liked is None:
+        likes = db.session.scalar(db.select(Post.likes).filter_by(id=post_id))
+        return jsonify({'status': 'liked', 'points': current_user.points, 'likes': likes or 0})
+
+    # Counters are incremented in SQL, so concurrent likes don't overwrite each other
+    likes = db.session.scalar(
+        db.update(Post).where(Post.id == post_id)
+        .values(likes=db.func.coalesce(Post.likes, 0) + 1, updated_at=Post.updated_at)
+        .returning(Post.likes))
     
     # Simple Gamification: Award point for liking
-    if current_user.points is None: current_user.points = 0
-    current_user.points += 1
-    check_badges(current_user)
+    points = db.session.scalar(
+        db.update(User).where(User.id == current_user.id)
+        .values(points=db.func.coalesce(User.points, 0) + 1)
+        .returning(User.points))
+    check_badges(current_user, 'points', points - 1, points)
     db.session.commit()
+    user_cache.invalidate(current_user.id)
     
-    return jsonify({'status': 'success', 'points': current_user.points, 'likes': post.likes})
+    return jsonify({'status': 'success', 'points': points, 'likes': likes})
+
+@app.route('/api/likes')
+def liked_posts():
+    # Like counts for a page of posts (?ids=1,2,3) and which of them the
+    # current user liked; cached pages fill in their buttons from this
+    ids = [int(i) for i in request.args.get('ids', '').split(',')[:100] if i.isdigit()]
+    if not ids:
+        return jsonify({'likes': {}, 'liked': []})
+    user_id = current_user.id if current_user.is_authenticated else None
+    rows = db.session.execute(
+        db.select(Post.id, Post.likes, post_like.c.user_id.is_not(None))
+        .outerjoin(post_like, db.and_(post_like.c.post_id == Post.id, post_like.c.user_id == user_id))
+        .where(Post.id.in_(ids))).all()
+    return jsonify({'likes': {str(id): likes or 0 for id, likes, _ in rows},
+                    'liked': [id for id, _, liked in rows if liked]})
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -286,8 +439,8 @@ def register():
         user = User(username=form.username.data, email=form.email.data, points=1)
         user.set_password(form.password.data)
         db.session.add(user)
-        db.session.commit()
-        check_badges(user)
+        db.session.flush()
+        check_badges(user, 'points', 0, user.points)
         db.session.commit()
         flash('Hisobingiz muvaffaqiyatli yaratildi! Endi kirishingiz mumkin.', 'success')
         return redirect(url_for('login'))
@@ -322,10 +475,14 @@ def account():
         if form.picture.data:
             picture_file = save_picture(form.picture.data, 'avatars')
             current_user.avatar = picture_file
+            current_user.avatar_variants = None
         current_user.username = form.username.data
         current_user.email = form.email.data
         current_user.bio = form.bio.data
         db.session.commit()
+        user_cache.invalidate(current_user.id)
+        if form.picture.data:
+            image_pipeline.submit(current_user.avatar, 'avatars')
         flash('Hisobingiz ma\'lumotlari yangilandi!', 'success')
         return redirect(url_for('account'))
     elif request.method == 'GET':
@@ -350,7 +507,7 @@ def save_picture(form_picture, subdir=''):
         os.makedirs(path)
     picture_path = os.path.join(path, picture_fn)
     
-    # Resize image could go here (using Pillow)
+    # Resized/WebP variants are made in the background, see image_pipeline
     form_picture.save(picture_path)
     
     return picture_fn
@@ -362,10 +519,12 @@ def save_picture(form_picture, subdir=''):
 def admin_dashboard():
     if not current_user.is_admin:
         abort(403)
-    posts = Post.query.order_by(Post.created_at.desc()).all()
-    total_comments = Comment.query.count()
+    posts = Post.query.options(db.defer(Post.content), db.joinedload(Post.category)) \
+        .order_by(Post.created_at.desc()).all()
+    total_comments = sum(post.comment_count or 0 for post in posts)
     total_users = User.query.count()
-    recent_comments = Comment.query.order_by(Comment.created_at.desc()).limit(10).all()
+    recent_comments = Comment.query.options(db.joinedload(Comment.post)) \
+        .order_by(Comment.created_at.desc()).limit(10).all()
     return render_template('admin/dashboard.html', posts=posts, total_comments=total_comments, 
                            total_users=total_users, recent_comments=recent_comments)
 
@@ -406,6 +565,8 @@ def new_post():
             if not os.path.exists(video_path): os.makedirs(video_path)
             form.video.data.save(os.path.join(video_path, filename))
             video_filename = filename
+        elif chunked_uploads.is_finished('videos', form.video_upload.data):
+            video_filename = form.video_upload.data
 
         audio_filename = None
         if form.audio.data:
@@ -414,6 +575,8 @@ def new_post():
             if not os.path.exists(audio_path): os.makedirs(audio_path)
             form.audio.data.save(os.path.join(audio_path, filename))
             audio_filename = filename
+        elif chunked_uploads.is_finished('audio', form.audio_upload.data):
+            audio_filename = form.audio_upload.data
             
         post = Post(
             title=form.title.data,
@@ -424,8 +587,12 @@ def new_post():
             video_url=video_filename,
             audio_url=audio_filename
         )
+        prerender_post(post)
         db.session.add(post)
+        update_related(post)
         db.session.commit()
+        invalidate_site_context()
+        image_pipeline.submit(post.image_url)
         flash('Maqola yaratildi!', 'success')
         return redirect(url_for('admin_dashboard'))
     elif request.method == 'POST':
@@ -454,6 +621,7 @@ def edit_post(id):
         if form.image.data:
             filename = secure_filename(form.image.data.filename)
             post.image_url = filename
+            post.image_variants = None
             form.image.data.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
             
         if form.video.data:
@@ -462,6 +630,8 @@ def edit_post(id):
             if not os.path.exists(video_path): os.makedirs(video_path)
             form.video.data.save(os.path.join(video_path, filename))
             post.video_url = filename
+        elif chunked_uploads.is_finished('videos', form.video_upload.data):
+            post.video_url = form.video_upload.data
 
         if form.audio.data:
             filename = secure_filename(form.audio.data.filename)
@@ -469,8 +639,15 @@ def edit_post(id):
             if not os.path.exists(audio_path): os.makedirs(audio_path)
             form.audio.data.save(os.path.join(audio_path, filename))
             post.audio_url = filename
+        elif chunked_uploads.is_finished('audio', form.audio_upload.data):
+            post.audio_url = form.audio_upload.data
             
+        prerender_post(post)
+        update_related(post)
         db.session.commit()
+        invalidate_site_context()
+        if form.image.data:
+            image_pipeline.submit(post.image_url)
         flash('Maqola yangilandi!', 'success')
         return redirect(url_for('admin_dashboard'))
         
@@ -482,8 +659,11 @@ def delete_post(id):
     if not current_user.is_admin:
         abort(403)
     post = Post.query.get_or_404(id)
+    db.session.execute(post_like.delete().where(post_like.c.post_id == post.id))
+    remove_related(post.id)
     db.session.delete(post)
     db.session.commit()
+    invalidate_site_context()
     flash('Maqola o\'chirildi', 'success')
     return redirect(url_for('admin_dashboard'))
 
@@ -494,7 +674,9 @@ def delete_comment(id):
         abort(403)
     comment = Comment.query.get_or_404(id)
     db.session.delete(comment)
+    count_comments(comment.post_id, -1)
     db.session.commit()
+    page_cache.invalidate()
     flash('Izoh o\'chirildi', 'success')
     return redirect(url_for('admin_dashboard'))
 
@@ -512,11 +694,79 @@ def admin_settings():
         settings.twitter = form.twitter.data
         settings.youtube = form.youtube.data
         db.session.commit()
+        invalidate_site_context()
         flash('Sozlamalar saqlandi!', 'success')
         return redirect(url_for('admin_settings'))
         
     return render_template('admin/settings.html', form=form, settings=settings)
 
+# --- Chunked Media Uploads ---
+# POST /admin/uploads {kind, filename, size, checksum?} -> {id, offset, chunk_size}
+# PATCH /admin/uploads/<id> (Upload-Offset, Upload-Checksum: sha256=<b64>) -> {offset}
+# GET /admin/uploads/<id> -> {offset} to resume; POST .../complete -> {filename}
+def require_upload_access():
+    if not current_user.is_admin:
+        abort(403)
+    if app.config.get('WTF_CSRF_ENABLED', True):
+        try:
+            validate_csrf(request.headers.get('X-CSRFToken'))
+        except ValidationError:
+            abort(400)
+
+@app.errorhandler(UploadError)
+def upload_error(e):
+    return jsonify({'status': 'error', 'message': e.message}), e.status
+
+@app.route('/admin/uploads', methods=['POST'])
+@login_required
+def upload_create():
+    require_upload_access()
+    data = request.get_json(silent=True) or {}
+    status = chunked_uploads.create(data.get('kind'), data.get('filename'), data.get('size'), data.get('checksum'))
+    return jsonify(status), 201
+
+@app.route('/admin/uploads/<upload_id>', methods=['GET', 'PATCH'])
+@login_required
+def upload_chunk(upload_id):
+    if request.method == 'GET':
+        if not current_user.is_admin:
+            abort(403)
+        return jsonify(chunked_uploads.status(upload_id))
+    require_upload_access()
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        raise UploadError('Upload-Offset sarlavhasi kerak')
+    status = chunked_uploads.write_chunk(upload_id, offset, request.stream, request.headers.get('Upload-Checksum'))
+    return jsonify(status)
+
+@app.route('/admin/uploads/<upload_id>/complete', methods=['POST'])
+@login_required
+def upload_complete(upload_id):
+    require_upload_access()
+    kind, filename = chunked_uploads.complete(upload_id)
+    data = request.get_json(silent=True) or {}
+    if data.get('post_id'):
+        # Attach straight to an existing post
+        post = Post.query.get_or_404(int(data['post_id']))
+        if kind == 'videos':
+            post.video_url = filename
+        else:
+            post.audio_url = filename
+        prerender_post(post)  # restamps html_version with the new updated_at
+        db.session.commit()
+        invalidate_site_context()
+    return jsonify({'status': 'success', 'filename': filename, 'kind': kind})
+
+@app.route('/admin/metrics')
+def admin_metrics():
+    # Prometheus scrape endpoint: admins, or a bearer token for the scraper
+    token = app.config.get('METRICS_TOKEN')
+    auth = request.headers.get('Authorization', '')
+    scraper = bool(token) and hmac.compare_digest(auth, f'Bearer {token}')
+    if not scraper and not (current_user.is_authenticated and current_user.is_admin):
+        abort(403)
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 # --- CLI Commands ---
 @app.cli.command("seed-db")
 def seed_db():
@@ -537,26 +787,167 @@ def seed_db():
             print("Categories created.")
             
         db.session.commit()
+        invalidate_site_context()
         print("Database seeded successfully.")
+    if not index_complete():
+        rebuild_index()
+
+@app.cli.command("search-index")
+def search_index():
+    # (Re)build the full-text search index from the post table
+    if rebuild_index():
+        print(f"Search index rebuilt for {Post.query.count()} posts.")
+    else:
+        print("Full-text search needs SQLite FTS5; skipped.")
+
+@app.cli.command("badges-backfill")
+def badges_backfill():
+    # Award badges to everyone who qualifies, e.g. after adding a rule
+    print(f"Awarded {badge_engine.backfill()} badges.")
+
+@app.cli.command("related-index")
+def related_index():
+    # Rebuild the related posts lists from scratch
+    print(f"Related posts indexed for {rebuild_related()} posts.")
+
+@app.cli.command("images-backfill")
+def images_backfill():
+    # Build resized/WebP variants for images uploaded before the pipeline
+    folder = app.config['UPLOAD_FOLDER']
+    jobs = []
+    for subdir in ('', 'avatars'):
+        path = os.path.join(folder, subdir)
+        if not os.path.isdir(path):
+            continue
+        for name in sorted(os.listdir(path)):
+            if os.path.isfile(os.path.join(path, name)) and name.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS:
+                jobs.append(image_pipeline.submit(name, subdir))
+    failed = 0
+    for job in jobs:
+        try:
+            job.result()
+        except Exception:
+            failed += 1
+    print(f"Processed {len(jobs) - failed} images ({failed} failed).")
+
+@app.cli.command("compress-static")
+def compress_static_assets():
+    # Pre-compress CSS/JS/SVG so they are served as .br/.gz without per-request work
+    print(f"Compressed {compress_static(app.static_folder)} static files.")
+
+@app.cli.command("export-static")
+@click.argument('output', default='build')
+@click.option('--base-url', default='http://localhost', help='Public URL of the exported site')
+@click.option('--full', is_flag=True, help='Re-render every page')
+@click.option('--workers', type=int, help='Rendering processes (default: CPU count)')
+def export_static_site(output, base_url, full, workers):
+    # Static HTML of the read-only pages, re-rendering only what changed since the last export
+    rendered, removed, copied = export_static(app, output, base_url=base_url, full=full, workers=workers)
+    print(f"Exported {rendered} pages ({removed} removed, {copied} assets copied) to {output}.")
+
+@app.cli.command("import-posts")
+@click.argument('directory', default='posts')
+@click.option('--author', help='Username to set as the author of new posts')
+@click.option('--workers', type=int, help='Rendering processes (default: CPU count)')
+def import_posts(directory, author, workers):
+    # Front-matter Markdown files -> posts; unchanged files are skipped on re-runs
+    author_id = None
+    if author:
+        user = User.query.filter_by(username=author).first()
+        if user is None:
+            raise click.BadParameter(f"no user named {author!r}", param_hint='--author')
+        author_id = user.id
+    created, updated, skipped = PostImporter(directory, author_id=author_id, workers=workers).run()
+    if created or updated:
+        rebuild_related(workers=workers)
+        invalidate_site_context()
+        page_cache.invalidate()
+    print(f"Imported {created} new and {updated} changed posts ({skipped} unchanged).")
+
+@app.cli.command("export-data")
+@click.argument('path')
+def export_data_command(path):
+    # Consistent JSONL dump of every table while the site keeps running (.gz/.xz compress, - is stdout)
+    counts = export_data(path)
+    click.echo(f"Exported {sum(counts.values())} rows from {len(counts)} tables.", err=True)
+
+@app.cli.command("import-data")
+@click.argument('path')
+@click.option('--replace', is_flag=True, help='Delete existing rows first')
+def import_data_command(path, replace):
+    # Restore an export-data dump into a database migrated to the same revision
+    try:
+        counts = import_data(path, replace=replace)
+    except RestoreError as e:
+        raise click.ClickException(str(e))
+    invalidate_site_context()
+    page_cache.invalidate()
+    user_cache.invalidate()
+    badge_engine.reset()
+    click.echo(f"Imported {sum(counts.values())} rows into {len(counts)} tables.", err=True)
+
+@app.cli.command("render-posts")
+def render_posts():
+    # Re-render stored HTML (and text stats), e.g. after changing allowed tags or extensions
+    count, last_id = 0, 0
+    while True:
+        batch = Post.query.filter(Post.id > last_id).order_by(Post.id).limit(100).all()
+        if not batch:
+            break
+        for post in batch:
+            word_count, reading_time = text_stats(post.content)
+            db.session.execute(
+                db.update(Post).where(Post.id == post.id).values(
+                    content_html=render_markdown(post.content),
+                    html_version=html_version(post),
+                    word_count=word_count,
+                    reading_time=reading_time,
+                    updated_at=Post.updated_at
+                )
+            )
+        db.session.commit()
+        count += len(batch)
+        last_id = batch[-1].id
+    print(f"Rendered {count} posts.")
+
+@app.cli.command("check-queries")
+def check_queries():
+    # Requests each page that has a SQL_QUERY_BUDGET, starting from cold caches, as a
+    # reader and as an admin; fails if any runs more statements than its budget
+    post = Post.query.order_by(Post.id).first()
+    admin = User.query.filter_by(is_admin=True).first()
+    if post is None or admin is None:
+        raise click.ClickException("Needs a post and an admin user; run `flask seed-db` first.")
+    paths = {'index': '/', 'blog': '/blog', 'post': f'/post/{post.slug}', 'admin_dashboard': '/admin'}
+    reader, editor = app.test_client(), app.test_client()
+    with editor.session_transaction() as session:
+        session['_user_id'] = str(admin.id)
+    failed = 0
+    for who, client in (('reader', reader), ('admin', editor)):
+        for endpoint, budget in app.config['SQL_QUERY_BUDGET'].items():
+            try:
+                # Own app context: the command's would share g between requests
+                with app.app_context(), max_queries(budget) as count:
+                    client.get(paths[endpoint])
+                print(f"{endpoint} ({who}): {count[0]} statements (budget: {budget})")
+            except QueryBudgetExceeded as e:
+                failed += 1
+                print(f"{endpoint} ({who}): {e}")
+    view_counter.discard()
+    analytics_collector.discard()
+    if failed:
+        raise click.ClickException(f"{failed} page(s) over their query budget.")
 
 # --- Analytics & Middleware ---
 @app.before_request
 def track_analytics():
-    if request.path.startswith('/static') or request.path.startswith('/api'):
+    if request.path.startswith(('/static', '/api', '/media')):
         return
         
-    today = datetime.utcnow().date()
-    analytics = Analytics.query.filter_by(date=today).first()
-    
-    if not analytics:
-        analytics = Analytics(date=today, page_views=0, unique_visitors=0)
-        db.session.add(analytics)
-    
-    analytics.page_views = (analytics.page_views or 0) + 1
-    # Simple unique visitor tracking (IP based - not perfect but okay for v2)
-    # in real app use redis or session checking
-    analytics.unique_visitors = (analytics.unique_visitors or 0) + 1 
-    db.session.commit()
+    # Buffered in memory and merged into Analytics by the collector;
+    # visitors are counted with a HyperLogLog sketch of IP + User-Agent
+    visitor = f"{request.remote_addr or ''}|{request.user_agent.string}"
+    analytics_collector.record(visitor)
 
 @app.route('/api/dashboard/stats')
 @login_required
@@ -0,0 +1,169 @@
+import base64
+import gzip
+import json
+import lzma
+import sys
+from datetime import date, datetime
+
+from extensions import db
+
+FORMAT = 'problog-jsonl'
+VERSION = 1
+BATCH_SIZE = 1000
+
+# Dump layout, one JSON document per line:
+#   {"format": ..., "version": ..., "revision": <alembic revision>}
+#   {"table": <name>, "columns": [...]}   then one array per row
+# Tables come in foreign key order (parents first), so a restore can
+# insert them as they stream in.
+
+
+def _open(path, mode):
+    # '-' is stdin/stdout; .gz and .xz files are compressed
+    if path == '-':
+        return sys.stdout if mode == 'w' else sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=6)
+    if path.endswith('.xz'):
+        return lzma.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _decoder(column):
+    if isinstance(column.type, db.DateTime):
+        return datetime.fromisoformat
+    if isinstance(column.type, db.Date):
+        return date.fromisoformat
+    if isinstance(column.type, db.LargeBinary):
+        return base64.b64decode
+    return None
+
+
+def _revision(conn):
+    try:
+        return conn.execute(db.text('SELECT version_num FROM alembic_version')).scalar()
+    except Exception:
+        return None
+
+
+def _tables():
+    return db.metadata.sorted_tables
+
+
+def _snapshot(conn):
+    # One consistent view of every table while workers keep writing
+    if conn.dialect.name == 'sqlite':
+        conn.exec_driver_sql('BEGIN')  # WAL readers see the database as of their first read
+    elif conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+
+
+def export_data(path):
+    # Streams every table to path; returns {table: rows written}. Rows are
+    # fetched yield_per (a server-side cursor on PostgreSQL), so memory
+    # stays flat whatever the table size.
+    counts = {}
+    out = _open(path, 'w')
+    try:
+        with db.engine.connect() as conn:
+            _snapshot(conn)
+            out.write(json.dumps({'format': FORMAT, 'version': VERSION, 'revision': _revision(conn)}) + '\n')
+            for table in _tables():
+                columns = [c.name for c in table.columns]
+                out.write(json.dumps({'table': table.name, 'columns': columns}) + '\n')
+                query = db.select(table).order_by(*table.primary_key.columns)
+                count = 0
+                for row in conn.execution_options(yield_per=BATCH_SIZE).execute(query):
+                    out.write(json.dumps(list(row), default=_encode, ensure_ascii=False,
+                                         separators=(',', ':')) + '\n')
+                    count += 1
+                counts[table.name] = count
+            conn.rollback()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return counts
+
+
+class RestoreError(Exception):
+    pass
+
+
+def _reset_sequences(conn):
+    # Rows were inserted with their ids, so PostgreSQL sequences are behind
+    for table in _tables():
+        pk = list(table.primary_key.columns)
+        if len(pk) == 1 and isinstance(pk[0].type, db.Integer):
+            conn.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', '{pk[0].name}'), "
+                f"COALESCE((SELECT MAX(\"{pk[0].name}\") FROM \"{table.name}\"), 0) + 1, false)"))
+
+
+def import_data(path, replace=False):
+    # Loads a dump made by export_data into the current database (schema
+    # from `flask db upgrade`) in one transaction, with executemany INSERTs
+    # of BATCH_SIZE rows; returns {table: rows inserted}. The target must
+    # be empty unless replace=True, which deletes existing rows first.
+    tables = {table.name: table for table in _tables()}
+    counts = {}
+    source = _open(path, 'r')
+    try:
+        header = json.loads(source.readline() or 'null')
+        if not isinstance(header, dict) or header.get('format') != FORMAT:
+            raise RestoreError('Not a data export file')
+        if header.get('version') != VERSION:
+            raise RestoreError(f"Unsupported export version {header.get('version')}")
+        with db.engine.begin() as conn:
+            revision = _revision(conn)
+            if header.get('revision') != revision:
+                raise RestoreError(f"Export is from schema {header.get('revision')}, database is at {revision}; "
+                                   "run `flask db upgrade` to the same revision first")
+            if replace:
+                for table in reversed(_tables()):
+                    conn.execute(table.delete())
+            else:
+                for table in _tables():
+                    if conn.execute(db.select(db.literal(1)).select_from(table).limit(1)).first():
+                        raise RestoreError(f"Table {table.name} is not empty (use --replace)")
+
+            table, columns, decoders, batch = None, [], [], []
+
+            def flush():
+                if batch:
+                    conn.execute(table.insert(), batch)
+                    counts[table.name] = counts.get(table.name, 0) + len(batch)
+                    batch.clear()
+
+            for line in source:
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    flush()
+                    table = tables.get(record['table'])
+                    if table is None:
+                        raise RestoreError(f"Unknown table {record['table']}")
+                    # Columns the current schema no longer has are dropped
+                    columns = [(i, name) for i, name in enumerate(record['columns']) if name in table.c]
+                    decoders = [_decoder(table.c[name]) for _, name in columns]
+                    continue
+                row = {}
+                for (i, name), decode in zip(columns, decoders):
+                    value = record[i]
+                    row[name] = decode(value) if decode is not None and value is not None else value
+                batch.append(row)
+                if len(batch) >= BATCH_SIZE:
+                    flush()
+            flush()
+            if conn.dialect.name == 'postgresql':
+                _reset_sequences(conn)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    return counts
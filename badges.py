@@ -0,0 +1,111 @@
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Badge, User, user_badges
+
+BadgeRule = namedtuple('BadgeRule', 'name description icon metric threshold')
+
+# A badge is earned once the user's metric reaches the threshold; the
+# only metric reported so far is points (User.points)
+RULES = (
+    BadgeRule('Boshlang\'ich', 'Ilk qadam!', 'footprints', 'points', 1),
+    BadgeRule('Kitobxon', '10 ta maqola o\'qildi', 'book-open', 'points', 10),
+)
+
+
+def criteria(rule):
+    return f"{rule.metric}_{rule.threshold}"
+
+
+def _qualifying(rule):
+    # SELECT of the ids of every user whose metric reaches the rule's threshold
+    column = {'points': db.func.coalesce(User.points, 0)}[rule.metric]
+    return db.select(User.id).where(column >= rule.threshold)
+
+
+class BadgeEngine:
+    # Evaluates RULES incrementally: callers report a metric moving from
+    # old to new, and only rules whose threshold lies in (old, new] are
+    # checked, so most calls run no SQL at all. Badge rows are loaded once
+    # per process.
+    def __init__(self, rules=RULES):
+        self.rules = rules
+        self._badge_ids = None
+        self._lock = threading.Lock()
+
+    def badge_ids(self):
+        # {criteria: badge id}. Missing badges are added in the caller's
+        # transaction and only cached once a later call finds them committed;
+        # criteria is unique, so a worker racing another one re-reads theirs.
+        with self._lock:
+            if self._badge_ids is not None:
+                return self._badge_ids
+            rows = dict(db.session.execute(db.select(Badge.criteria, Badge.id)).all())
+            missing = [rule for rule in self.rules if criteria(rule) not in rows]
+            if not missing:
+                self._badge_ids = rows
+                return rows
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(db.insert(Badge), [
+                        {'name': rule.name, 'description': rule.description,
+                         'icon': rule.icon, 'criteria': criteria(rule)} for rule in missing])
+            except IntegrityError:
+                pass  # added by a concurrent request
+            return dict(db.session.execute(db.select(Badge.criteria, Badge.id)).all())
+
+    def reset(self):
+        with self._lock:
+            self._badge_ids = None
+
+    def crossed(self, metric, old, new):
+        old = old or 0
+        return [rule for rule in self.rules if rule.metric == metric and old < rule.threshold <= (new or 0)]
+
+    def evaluate(self, user, metric, old, new):
+        # Adds newly earned badges to the session (no commit); returns their rules
+        rules = self.crossed(metric, old, new)
+        if not rules:
+            return []
+        ids = self.badge_ids()
+        wanted = {ids[criteria(rule)]: rule for rule in rules}
+        owned = set(db.session.scalars(
+            db.select(user_badges.c.badge_id)
+            .where(user_badges.c.user_id == user.id, user_badges.c.badge_id.in_(wanted))))
+        earned = [badge_id for badge_id in wanted if badge_id not in owned]
+        if earned:
+            now = datetime.utcnow()
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(user_badges.insert(), [
+                        {'user_id': user.id, 'badge_id': badge_id, 'earned_at': now} for badge_id in earned])
+            except IntegrityError:
+                return []  # awarded by a concurrent request
+            db.session.expire(user, ['badges'])
+        return [wanted[badge_id] for badge_id in earned]
+
+    def backfill(self):
+        # Awards every rule to every qualifying user, one INSERT ... SELECT
+        # per rule; returns the number of badges awarded
+        ids = self.badge_ids()
+        now = datetime.utcnow()
+        count = db.select(db.func.count()).select_from(user_badges)
+        before = db.session.scalar(count)
+        for rule in self.rules:
+            badge_id = ids[criteria(rule)]
+            users = _qualifying(rule).subquery()
+            owned = db.select(user_badges.c.user_id).where(user_badges.c.badge_id == badge_id)
+            select = db.select(users.c[0], db.literal(badge_id), db.literal(now)) \
+                .where(users.c[0].not_in(owned))
+            db.session.execute(
+                user_badges.insert().from_select(['user_id', 'badge_id', 'earned_at'], select))
+        awarded = db.session.scalar(count) - before  # rowcount isn't reliable for INSERT ... SELECT
+        db.session.commit()
+        return awarded
+
+
+badge_engine = BadgeEngine()
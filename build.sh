@@ -10,6 +10,9 @@ mkdir -p static/uploads/videos
 mkdir -p static/uploads/audio
 mkdir -p static/uploads/avatars
 
+# Pre-compress static assets (.br/.gz served to clients that accept them)
+flask compress-static
+
 # Run database migrations
 flask db upgrade
 
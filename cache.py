@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class LRUCache:
+    # Bounded, thread-safe in-process cache (one per gunicorn worker)
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class VersionStamp:
+    # Cross-worker invalidation marker: a small file whose mtime/inode is the
+    # version. Checking it is a single stat() call, no database round trip.
+    def __init__(self, name):
+        self.name = name
+
+    def _path(self):
+        folder = current_app.config.get('CACHE_STAMP_DIR') or os.path.join(current_app.instance_path, 'stamps')
+        return os.path.join(folder, self.name)
+
+    def current(self):
+        try:
+            st = os.stat(self._path())
+        except FileNotFoundError:
+            return 0
+        return (st.st_mtime_ns, st.st_ino)
+
+    def bump(self):
+        path = self._path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(str(time.time_ns()))
+        os.replace(tmp, path)  # new inode, so even same-mtime bumps differ
@@ -0,0 +1,168 @@
+import gzip
+import mimetypes
+import os
+import zlib
+from functools import wraps
+
+from flask import current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE = {
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript', 'text/csv',
+    'application/json', 'application/javascript', 'application/xml',
+    'application/rss+xml', 'application/atom+xml', 'image/svg+xml',
+}
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+# Extensions pre-compressed by compress_static (uploads are left alone)
+STATIC_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.xml', '.html', '.map')
+
+
+def compress(data, coding, level=None):
+    if coding == 'br':
+        return brotli.compress(data, quality=current_app.config['COMPRESS_BR_LEVEL'] if level is None else level)
+    # mtime=0: the same input always gives the same bytes (and ETag)
+    return gzip.compress(data, compresslevel=current_app.config['COMPRESS_GZIP_LEVEL'] if level is None else level,
+                         mtime=0)
+
+
+def _streaming(chunks, coding, level):
+    # Flushes after every chunk, so streamed pages still arrive progressively.
+    # Runs after the request has ended: no current_app here.
+    if coding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        feed, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        feed, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+    for chunk in chunks:
+        data = feed(chunk) + flush()
+        if data:
+            yield data
+    yield finish()
+
+
+def compress_static(folder, skip=('uploads',)):
+    # Writes <file>.gz (and <file>.br with brotli installed) next to every
+    # text asset under folder whose compressed copy is missing or older;
+    # returns the number of files written
+    written = 0
+    codings = [c for c in SUFFIXES if c != 'br' or brotli is not None]
+    for root, dirs, files in os.walk(folder):
+        if root == folder:
+            dirs[:] = [d for d in dirs if d not in skip]
+        for name in files:
+            if not name.endswith(STATIC_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            mtime = os.stat(path).st_mtime
+            data = None
+            for coding in codings:
+                target = path + SUFFIXES[coding]
+                if os.path.exists(target) and os.stat(target).st_mtime >= mtime:
+                    continue
+                if data is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                with open(target + '.tmp', 'wb') as f:
+                    f.write(compress(data, coding, level=11 if coding == 'br' else 9))
+                os.replace(target + '.tmp', target)
+                written += 1
+    return written
+
+
+class Compressor:
+    # gzip/brotli (when the brotli package is installed) for responses,
+    # negotiated from Accept-Encoding. Dynamic responses are compressed
+    # after the request if they are compressible and at least
+    # COMPRESS_MIN_SIZE bytes; streamed ones are compressed chunk by chunk.
+    # Static files are served from the .br/.gz copies written at build time
+    # by compress_static. Cached pages keep their compressed bodies, see
+    # PageCache._respond.
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BR_LEVEL', 5)
+        app.after_request(self._compress)
+        if 'static' in app.view_functions:
+            app.view_functions['static'] = self._static(app.view_functions['static'])
+
+    def accepted(self):
+        # Codings the client accepts, best first (brotli wins ties)
+        codings = [c for c in ('br', 'gzip') if c != 'br' or brotli is not None]
+        qualities = {c: request.accept_encodings[c] for c in codings}
+        return sorted((c for c in codings if qualities[c] > 0), key=lambda c: -qualities[c])
+
+    def choose(self, mimetype, size):
+        # Coding for a body of this type and size, or None to send it as is
+        if mimetype not in COMPRESSIBLE or size < current_app.config['COMPRESS_MIN_SIZE']:
+            return None
+        accepted = self.accepted()
+        return accepted[0] if accepted else None
+
+    def _compress(self, response):
+        if (response.status_code != 200 or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE
+                or response.cache_control.no_transform):
+            return response
+        if not response.is_streamed and response.content_length < current_app.config['COMPRESS_MIN_SIZE']:
+            return response
+        response.vary.add('Accept-Encoding')
+        accepted = self.accepted()
+        if not accepted:
+            return response
+        coding = accepted[0]
+        if response.is_streamed:
+            original = response.response
+            level = current_app.config['COMPRESS_BR_LEVEL' if coding == 'br' else 'COMPRESS_GZIP_LEVEL']
+            response.response = _streaming(response.iter_encoded(), coding, level)
+            if hasattr(original, 'close'):
+                response.call_on_close(original.close)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(compress(response.get_data(), coding))
+        response.headers['Content-Encoding'] = coding
+        # Each coding is a different representation, so it gets its own ETag
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{coding}', weak)
+            response.make_conditional(request)
+        return response
+
+    def _static(self, view):
+        @wraps(view)
+        def serve(filename):
+            mimetype = mimetypes.guess_type(filename)[0]
+            if mimetype not in COMPRESSIBLE:
+                return view(filename=filename)
+            folder = current_app.static_folder
+            source = safe_join(folder, filename)
+            if source and os.path.isfile(source):
+                mtime = os.stat(source).st_mtime
+                for coding in self.accepted():
+                    path = source + SUFFIXES[coding]
+                    # A copy older than its source is stale: skip it until the next build
+                    if os.path.isfile(path) and os.stat(path).st_mtime >= mtime:
+                        response = send_from_directory(
+                            folder, filename + SUFFIXES[coding], mimetype=mimetype,
+                            max_age=current_app.get_send_file_max_age(filename))
+                        response.headers['Content-Encoding'] = coding
+                        response.vary.add('Accept-Encoding')
+                        return response
+            response = view(filename=filename)
+            response.vary.add('Accept-Encoding')
+            return response
+        return serve
+
+
+compressor = Compressor()
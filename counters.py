@@ -0,0 +1,115 @@
+import atexit
+import os
+import threading
+import time
+from collections import Counter
+
+from extensions import db
+
+
+class BufferedWriter:
+    # Base for write-behind buffers: subclasses collect data in memory and
+    # implement _drain() (swap out the buffer), _write() and _restore().
+    config_key = None
+    default_interval = 10
+    thread_name = 'buffered-writer'
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = self.default_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault(self.config_key, self.default_interval)
+        self.app = app
+        self.interval = app.config[self.config_key]
+        atexit.register(self._flush_quietly)
+
+    def flush(self):
+        with self._lock:
+            batch = self._drain()
+        if not batch or self.app is None:
+            return 0
+        try:
+            with self.app.app_context():
+                return self._write(batch)
+        except Exception:
+            # Keep the data for the next attempt (e.g. "database is locked")
+            with self._lock:
+                self._restore(batch)
+            raise
+
+    def discard(self):
+        # Drops what is buffered, e.g. the views made by `flask check-queries`
+        with self._lock:
+            self._drain()
+
+    def _touched(self):
+        # Call after buffering; an interval of 0 means write-through
+        if self.interval <= 0:
+            self.flush()
+        else:
+            self._ensure_worker()
+
+    def _ensure_worker(self):
+        # Started lazily so every forked gunicorn worker gets its own thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name=self.thread_name, daemon=True).start()
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception as e:
+            self.app.logger.warning(f"{type(self).__name__} flush failed: {e}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self._flush_quietly()
+
+
+class ViewCounter(BufferedWriter):
+    # Write-behind post view counter. Each worker buffers increments in
+    # memory and periodically adds them to the database in one batched
+    # UPDATE; since the update is additive (views = views + n), buffers
+    # from all gunicorn workers sum up to the exact total.
+    config_key = 'VIEW_FLUSH_INTERVAL'
+    thread_name = 'view-counter'
+
+    def __init__(self, app=None):
+        self._pending = Counter()
+        super().__init__(app)
+
+    def increment(self, post_id, n=1):
+        with self._lock:
+            self._pending[post_id] += n
+        self._touched()
+
+    def _drain(self):
+        batch, self._pending = self._pending, Counter()
+        return batch
+
+    def _restore(self, batch):
+        self._pending.update(batch)
+
+    def _write(self, batch):
+        table = db.metadata.tables['post']
+        stmt = table.update().where(table.c.id == db.bindparam('post_id')).values(
+            views=db.func.coalesce(table.c.views, 0) + db.bindparam('n'),
+            updated_at=table.c.updated_at  # not a content edit
+        )
+        rows = [{'post_id': post_id, 'n': n} for post_id, n in batch.items()]
+        with db.engine.begin() as conn:
+            conn.execute(stmt, rows)
+        return sum(batch.values())
+
+
+view_counter = ViewCounter()
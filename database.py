@@ -0,0 +1,59 @@
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def database_url(url):
+    # Render/Heroku hand out postgres:// URLs, which SQLAlchemy no longer
+    # accepts; without an explicit driver, use psycopg 3 (see requirements)
+    for prefix in ('postgres://', 'postgresql://'):
+        if url.startswith(prefix):
+            url = 'postgresql+psycopg://' + url[len(prefix):]
+    return url
+
+
+def engine_options(url, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800):
+    # SQLite gets the default pool (one file, tuned by SQLitePragmas below);
+    # server databases get a bounded pool that drops stale connections
+    if url.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,
+        'pool_pre_ping': True,
+    }
+
+
+class SQLitePragmas:
+    # Per-connection SQLite tuning for several gunicorn workers sharing one
+    # file: WAL lets readers run while a writer commits, busy_timeout waits
+    # for the write lock instead of failing with "database is locked",
+    # synchronous=NORMAL is durable in WAL mode with fewer fsyncs, and
+    # mmap_size reads pages straight from the page cache.
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLITE_BUSY_TIMEOUT', 5000)  # ms
+        app.config.setdefault('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+        self.app = app
+        if not event.contains(Engine, 'connect', self._connect):
+            event.listen(Engine, 'connect', self._connect)
+
+    def _connect(self, dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f"PRAGMA busy_timeout={int(self.app.config['SQLITE_BUSY_TIMEOUT'])}")
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f"PRAGMA mmap_size={int(self.app.config['SQLITE_MMAP_SIZE'])}")
+        cursor.close()
+
+
+sqlite_pragmas = SQLitePragmas()
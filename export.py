@@ -0,0 +1,233 @@
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from urllib.parse import parse_qs, urlsplit
+
+from flask import render_template
+
+from extensions import db
+from forms import CommentForm
+from models import Category, Comment, Post, post_related
+from pagination import KeysetPagination
+from related import related_posts
+from rendering import get_post_html
+from site_context import get_site_context
+
+# Same page sizes as the index and blog views
+INDEX_SIZE = 6
+BLOG_SIZE = 9
+BATCH_SIZE = 50  # pages per worker task
+MANIFEST = '.export-manifest.json'
+
+_ATTR = re.compile(r'\b(href|src|srcset)="([^"]*)"')
+_app = None
+
+
+def _page_dir(category=None, page=1):
+    path = 'blog'
+    if category:
+        path += f'/category/{category}'
+    if page > 1:
+        path += f'/page/{page}'
+    return path
+
+
+def _static_url(url):
+    # Dynamic URL -> its exported file's URL; anything not exported is left as is
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path.startswith('/'):
+        return url
+    path, args = parts.path, parse_qs(parts.query)
+    if path == '/blog' and 'q' not in args and 'page' not in args:
+        # Exported listings use page numbers as cursors, see _listing
+        page = int((args.get('after') or args.get('before') or ['1'])[0])
+        return '/' + _page_dir((args.get('category') or [None])[0], page) + '/'
+    if path.startswith('/post/') and path.count('/') == 2:
+        return path + '/'
+    if path.startswith('/media/') and path.count('/') == 4:
+        _, _, kind, _, filename = path.split('/')
+        return f'/static/uploads/{kind}/{filename}'
+    return url
+
+
+def _rewrite(page):
+    def replace(match):
+        name, value = match.groups()
+        if name == 'srcset':
+            value = ', '.join(' '.join([_static_url(c.split(' ', 1)[0])] + c.split(' ', 1)[1:])
+                              for c in html.unescape(value).split(', '))
+        else:
+            value = _static_url(html.unescape(value))
+        return f'{name}="{html.escape(value)}"'
+    return _ATTR.sub(replace, page)
+
+
+def _write(out, path, page):
+    # Unchanged output keeps its mtime, so CDN/rsync uploads skip it
+    target = os.path.join(out, path, 'index.html')
+    data = _rewrite(page).encode()
+    if os.path.exists(target):
+        with open(target, 'rb') as f:
+            if f.read() == data:
+                return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(target + '.tmp', target)
+
+
+def _listing(template, ids, page, has_next):
+    by_id = {post.id: post for post in Post.query.options(
+        db.defer(Post.content), db.joinedload(Post.category),
+        db.joinedload(Post.author_ref)).filter(Post.id.in_(ids))}
+    posts = KeysetPagination([by_id[i] for i in ids if i in by_id],
+                             next_cursor=str(page + 1) if has_next else None,
+                             prev_cursor=str(page - 1) if page > 1 else None)
+    return render_template(template, posts=posts, search_query=None, highlights={})
+
+
+def _post(slug):
+    post = Post.query.options(db.joinedload(Post.category)).filter_by(slug=slug).one()
+    # Every comment inline: there is no comments endpoint to load more from
+    comments = Comment.query.filter_by(post_id=post.id) \
+        .options(db.joinedload(Comment.author_ref)) \
+        .order_by(Comment.created_at.desc(), Comment.id.desc()).all()
+    comments = KeysetPagination(comments, next_cursor=None, prev_cursor=None)
+    return render_template('post.html', post=post, content=get_post_html(post), form=CommentForm(),
+                           comments=comments, related=related_posts(post))
+
+
+def _init_worker(app):
+    global _app
+    _app = app
+    # (forked workers drop the inherited pool without closing its connections)
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def _render(out, base_url, pages):
+    # pages: [(path, url, kind, args)]; runs in a worker process
+    for path, url, kind, args in pages:
+        with _app.test_request_context(url, base_url=base_url):
+            if kind == 'post':
+                page = _post(*args)
+            elif kind == 'about':
+                page = render_template('about.html')
+            else:
+                page = _listing(kind, *args)
+        _write(out, path, page)
+        db.session.remove()
+    return len(pages)
+
+
+def _fingerprint(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _layout(base_url):
+    # What every page shows through base.html (settings, category names)
+    context = get_site_context()
+    return _fingerprint(base_url, sorted(vars(context['site_settings']).items()),
+                        [(c.id, c.name, c.slug, c.color, c.description) for c in context['categories']])
+
+
+def _pages():
+    # {path: (url, kind, args, fingerprint)} for every exported page; a page
+    # is re-rendered when its fingerprint changes, i.e. when a post on it
+    # (or, for post pages, a related post or a comment) changed
+    counts = [(c.slug, c.post_count) for c in get_site_context()['categories']]  # blog sidebar
+    rows = db.session.execute(
+        db.select(Post.id, Post.slug, Post.category_id, Post.updated_at)
+        .order_by(Post.created_at.desc(), Post.id.desc())).all()
+    stamps = {r.id: (r.slug, r.updated_at) for r in rows}
+    pages = {'': ('/', 'index.html', ([r.id for r in rows[:INDEX_SIZE]], 1, False),
+                  _fingerprint([stamps[r.id] for r in rows[:INDEX_SIZE]])),
+             'about': ('/about', 'about', (), _fingerprint())}
+
+    def listing(category, posts):
+        for start in range(0, max(len(posts), 1), BLOG_SIZE):
+            page = start // BLOG_SIZE + 1
+            ids = [r.id for r in posts[start:start + BLOG_SIZE]]
+            has_next = start + BLOG_SIZE < len(posts)
+            url = '/blog' + (f'?category={category}' if category else '')
+            pages[_page_dir(category, page)] = (url, 'blog.html', (ids, page, has_next),
+                                                _fingerprint([stamps[i] for i in ids], has_next, counts))
+
+    listing(None, rows)
+    for category in Category.query.all():
+        listing(category.slug, [r for r in rows if r.category_id == category.id])
+
+    comments = {post_id: (count, last) for post_id, count, last in db.session.execute(
+        db.select(Comment.post_id, db.func.count(), db.func.max(Comment.id)).group_by(Comment.post_id))}
+    related = {}
+    for post_id, related_id in db.session.execute(
+            db.select(post_related.c.post_id, post_related.c.related_id).order_by(post_related.c.score.desc())):
+        related.setdefault(post_id, []).append(related_id)
+    for r in rows:
+        pages[f'post/{r.slug}'] = (f'/post/{r.slug}', 'post', (r.slug,), _fingerprint(
+            r.updated_at, comments.get(r.id), [stamps.get(i) for i in related.get(r.id, [])]))
+    return pages
+
+
+def _copy_assets(static_folder, out):
+    # static/ (uploads included, partial uploads not) copied when size or mtime differ
+    copied = 0
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        target_dir = os.path.join(out, 'static', os.path.relpath(root, static_folder))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in files:
+            if name.endswith('.tmp'):
+                continue
+            source, target = os.path.join(root, name), os.path.join(target_dir, name)
+            st = os.stat(source)
+            if os.path.exists(target):
+                tt = os.stat(target)
+                if tt.st_size == st.st_size and int(tt.st_mtime) == int(st.st_mtime):
+                    continue
+            shutil.copy2(source, target)
+            copied += 1
+    return copied
+
+
+def export_static(app, out, base_url='http://localhost', full=False, workers=None):
+    # Renders the read-only pages into out/<path>/index.html plus static/.
+    # Only pages whose fingerprint changed since the last export are
+    # rendered (all of them after a layout change or with full=True), in
+    # a process pool. Returns (pages rendered, pages removed, assets copied).
+    os.makedirs(out, exist_ok=True)
+    manifest_path = os.path.join(out, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path) and not full:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    layout = _layout(base_url)
+    previous = manifest.get('pages', {}) if manifest.get('layout') == layout else {}
+
+    pages = _pages()
+    todo = [(path, url, kind, args) for path, (url, kind, args, fingerprint) in pages.items()
+            if previous.get(path) != fingerprint]
+    removed = [path for path in manifest.get('pages', {}) if path not in pages]
+    for path in removed:
+        shutil.rmtree(os.path.join(out, path), ignore_errors=True)
+
+    if todo:
+        # Forked, so workers inherit the app (spawn, the default on macOS and
+        # from Python 3.14 on Linux, would have to pickle it)
+        with ProcessPoolExecutor(workers or os.cpu_count(), mp_context=get_context('fork'),
+                                 initializer=_init_worker, initargs=(app,)) as pool:
+            jobs = [pool.submit(_render, out, base_url, todo[start:start + BATCH_SIZE])
+                    for start in range(0, len(todo), BATCH_SIZE)]
+            for job in jobs:
+                job.result()
+    copied = _copy_assets(app.static_folder, out)
+
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump({'layout': layout, 'pages': {path: page[3] for path, page in pages.items()}}, f)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return len(todo), len(removed), copied
@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, TextAreaField, SelectField, BooleanField
+from wtforms import StringField, PasswordField, SubmitField, TextAreaField, SelectField, BooleanField, HiddenField
 from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationError
 from flask_wtf.file import FileField, FileAllowed
 from flask_login import current_user
@@ -53,6 +53,9 @@ class PostForm(FlaskForm):
     image = FileField('Muqova Rasmi', validators=[FileAllowed(['jpg', 'png', 'jpeg', 'webp'], 'Faqat rasmlar!')])
     video = FileField('Video', validators=[FileAllowed(['mp4', 'mov', 'avi'], 'Faqat video (mp4, mov, avi)!')])
     audio = FileField('Audio', validators=[FileAllowed(['mp3', 'wav', 'ogg', 'm4a', 'flac', 'aac'], 'Faqat audio (mp3, wav, m4a, flac, aac, ogg)!')])
+    # Filenames of media already sent through the chunked upload API
+    video_upload = HiddenField()
+    audio_upload = HiddenField()
     summary = TextAreaField('Qisqacha mazmun')
     content = TextAreaField('Maqola matni')  # DataRequired removed because SimpleMDE syncs via JS
     submit = SubmitField('Saqlash')
@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import url_for
+from PIL import Image, ImageOps, features
+
+from extensions import db
+from models import Post, User
+from page_cache import page_cache
+from user_cache import user_cache
+
+# Variant widths per upload subdirectory ('' = post covers)
+WIDTHS = {
+    '': (320, 640, 1024, 1600),
+    'avatars': (64, 128, 256),
+}
+QUALITY = {'webp': 80, 'avif': 60}
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
+
+
+def _formats():
+    # AVIF first: browsers take the first <source> they support
+    return [fmt for fmt in ('avif', 'webp') if features.check(fmt)]
+
+
+def make_variants(upload_folder, subdir, filename):
+    # Writes uploads/variants/<subdir>/<filename>-<width>.<fmt> (the whole
+    # name, so cover.jpg and cover.png don't share variants) and returns the
+    # manifest {fmt: {width: path relative to uploads/}}; never upscales
+    src = os.path.join(upload_folder, subdir, filename)
+    out_dir = os.path.join(upload_folder, 'variants', subdir)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+    with Image.open(src) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+        widths = [w for w in WIDTHS.get(subdir, WIDTHS['']) if w < image.width] or [image.width]
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            for fmt in _formats():
+                name = f"{filename}-{width}.{fmt}"
+                resized.save(os.path.join(out_dir, name), fmt.upper(), quality=QUALITY[fmt])
+                manifest.setdefault(fmt, {})[str(width)] = '/'.join(p for p in ('variants', subdir, name) if p)
+    return manifest
+
+
+class ImagePipeline:
+    # Builds resized WebP/AVIF variants of uploaded covers and avatars in a
+    # thread pool (Pillow releases the GIL while resizing and encoding), then
+    # stores the manifest on the rows that use the file.
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IMAGE_WORKERS', 2)
+        self.app = app
+        app.add_template_global(picture_sources)
+
+    def _pool(self):
+        # One pool per forked gunicorn worker
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.app.config['IMAGE_WORKERS'],
+                                                    thread_name_prefix='images')
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, filename, subdir=''):
+        if not filename or filename.rsplit('.', 1)[-1].lower() not in IMAGE_EXTENSIONS:
+            return None
+        return self._pool().submit(self.process, filename, subdir)
+
+    def process(self, filename, subdir=''):
+        try:
+            manifest = make_variants(self.app.config['UPLOAD_FOLDER'], subdir, filename)
+            with self.app.app_context():
+                self._attach(filename, subdir, manifest)
+            return manifest
+        except Exception as e:
+            self.app.logger.warning(f"Image variants failed for {subdir}/{filename}: {e}")
+            raise
+
+    def _attach(self, filename, subdir, manifest):
+        value = json.dumps(manifest)
+        users = []
+        if subdir == 'avatars':
+            users = db.session.scalars(db.update(User).where(User.avatar == filename)
+                                       .values(avatar_variants=value).returning(User.id)).all()
+        else:
+            db.session.execute(db.update(Post).where(Post.image_url == filename)
+                               .values(image_variants=value, updated_at=Post.updated_at))
+        db.session.commit()
+        page_cache.invalidate()
+        for user_id in users:
+            user_cache.invalidate(user_id)
+
+
+def picture_sources(variants):
+    # Template helper: [{'type': 'image/webp', 'srcset': '/static/... 320w, ...'}]
+    # for <source> tags inside <picture>
+    if not variants:
+        return []
+    manifest = json.loads(variants) if isinstance(variants, str) else variants
+    sources = []
+    for fmt in ('avif', 'webp'):
+        widths = manifest.get(fmt)
+        if widths:
+            srcset = ', '.join(f"{url_for('static', filename='uploads/' + path)} {width}w"
+                               for width, path in sorted(widths.items(), key=lambda item: int(item[0])))
+            sources.append({'type': MIME_TYPES[fmt], 'srcset': srcset})
+    return sources
+
+
+image_pipeline = ImagePipeline()
@@ -0,0 +1,182 @@
+import hashlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from datetime import datetime
+from types import SimpleNamespace
+
+from slugify import slugify
+
+from extensions import db
+from models import Category, Post
+from rendering import html_version, render_markdown, text_stats
+
+BATCH_SIZE = 200  # files per transaction
+FRONT_MATTER_KEYS = ('title', 'date', 'summary', 'category', 'slug', 'status')
+_KEY_LINE = re.compile(r'^(\w+):\s*(.*)$')
+
+
+def _value(text):
+    return text.strip().strip('"\'')
+
+
+def parse_front_matter(text):
+    # (meta, body). Accepts a '---' fenced block or, as in posts/welcome.md,
+    # bare 'key: value' lines (known keys only) at the top of the file
+    lines = text.lstrip('\ufeff').splitlines()
+    meta = {}
+    if lines and lines[0].strip() == '---':
+        for end in range(1, len(lines)):
+            if lines[end].strip() == '---':
+                for line in lines[1:end]:
+                    match = _KEY_LINE.match(line)
+                    if match:
+                        meta[match.group(1).lower()] = _value(match.group(2))
+                return meta, '\n'.join(lines[end + 1:]).strip() + '\n'
+    start = 0
+    for line in lines:
+        match = _KEY_LINE.match(line)
+        if not match or match.group(1).lower() not in FRONT_MATTER_KEYS:
+            break
+        meta[match.group(1).lower()] = _value(match.group(2))
+        start += 1
+    return meta, '\n'.join(lines[start:]).strip() + '\n'
+
+
+def _files(directory):
+    # Streams (relative path, bytes) of every .md file, in a stable order
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith('.md'):
+                path = os.path.join(root, name)
+                with open(path, 'rb') as f:
+                    yield os.path.relpath(path, directory).replace(os.sep, '/'), f.read()
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _render(text):
+    # Runs in a worker process
+    return (render_markdown(text),) + text_stats(text)
+
+
+def _date(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+class PostImporter:
+    # Imports a tree of front-matter Markdown files as posts, keyed on the
+    # file's path: unchanged files (same sha1) are skipped, changed ones
+    # update their post (keeping its slug), new ones are inserted with a
+    # free slug. Each batch is one transaction with executemany INSERT and
+    # UPDATE; Markdown is rendered in a process pool.
+    def __init__(self, directory, author_id=None, workers=None):
+        self.directory = directory
+        self.author_id = author_id
+        self.workers = workers
+        self.created = self.updated = self.skipped = 0
+        self._slugs = None
+        self._categories = None
+
+    def run(self):
+        self._slugs = set(db.session.scalars(db.select(Post.slug)))
+        self._categories = {}
+        for category in Category.query.all():
+            self._categories[category.slug] = self._categories[category.name.lower()] = category.id
+        # (forked, whatever the platform default, so workers inherit the
+        # engine; they drop its pool without closing the connections)
+        with ProcessPoolExecutor(self.workers or os.cpu_count(), mp_context=get_context('fork'),
+                                 initializer=db.engine.dispose, initargs=(False,)) as pool:
+            for batch in _batches(_files(self.directory), BATCH_SIZE):
+                self._import(batch, pool)
+        return self.created, self.updated, self.skipped
+
+    def _import(self, batch, pool):
+        hashes = {path: hashlib.sha1(data).hexdigest() for path, data in batch}
+        existing = {row.source_path: row for row in db.session.execute(
+            db.select(Post.id, Post.source_path, Post.source_hash, Post.created_at)
+            .where(Post.source_path.in_(list(hashes))))}
+        changed = []
+        for path, data in batch:
+            row = existing.get(path)
+            if row is not None and row.source_hash == hashes[path]:
+                self.skipped += 1
+                continue
+            meta, body = parse_front_matter(data.decode('utf-8', errors='replace'))
+            changed.append((path, meta, body, row))
+        if not changed:
+            return
+
+        now = datetime.utcnow()
+        version = html_version(SimpleNamespace(updated_at=now))
+        inserts, updates = [], []
+        rendered = pool.map(_render, [body for _, _, body, _ in changed], chunksize=8)
+        for (path, meta, body, row), (content_html, word_count, reading_time) in zip(changed, rendered):
+            stem = os.path.splitext(os.path.basename(path))[0]
+            values = {
+                'title': (meta.get('title') or stem)[:150],
+                'content': body,
+                'summary': meta.get('summary'),
+                'category_id': self._category(meta.get('category')),
+                'status': meta.get('status') or 'published',
+                'content_html': content_html,
+                'html_version': version,
+                'word_count': word_count,
+                'reading_time': reading_time,
+                'source_hash': hashes[path],
+                'updated_at': now,
+            }
+            if row is None:
+                values.update(source_path=path, slug=self._free_slug(meta.get('slug') or values['title'] or stem),
+                              created_at=_date(meta.get('date')) or now, author_id=self.author_id,
+                              views=0, likes=0)
+                inserts.append(values)
+            else:
+                values.update(post_id=row.id, created_at=_date(meta.get('date')) or row.created_at)
+                updates.append(values)
+
+        if inserts:
+            db.session.execute(db.insert(Post), inserts)
+        if updates:
+            table = Post.__table__
+            columns = [k for k in updates[0] if k != 'post_id']
+            db.session.execute(
+                table.update().where(table.c.id == db.bindparam('post_id'))
+                .values({k: db.bindparam(f'new_{k}') for k in columns}),
+                [{'post_id': u['post_id'], **{f'new_{k}': u[k] for k in columns}} for u in updates])
+        db.session.commit()
+        self.created += len(inserts)
+        self.updated += len(updates)
+
+    def _category(self, value):
+        if not value:
+            return None
+        key = slugify(value)
+        if key not in self._categories and value.lower() not in self._categories:
+            category = Category(name=value[:50])
+            db.session.add(category)
+            db.session.flush()
+            self._categories[category.slug] = self._categories[value.lower()] = category.id
+        return self._categories.get(key) or self._categories[value.lower()]
+
+    def _free_slug(self, text):
+        base = slugify(text, max_length=140) or 'post'
+        slug, n = base, 2
+        while slug in self._slugs:
+            slug, n = f'{base}-{n}', n + 1
+        self._slugs.add(slug)
+        return slug
@@ -0,0 +1,173 @@
+import hashlib
+import mimetypes
+import os
+
+from flask import Response, abort, redirect, request, url_for
+from werkzeug.http import http_date, parse_range_header
+
+from uploads import MEDIA_EXTENSIONS
+
+READ_SIZE = 256 * 1024
+
+
+def _fingerprint(st):
+    # Changes whenever the file is replaced (edit_post reuses upload names)
+    raw = f"{st.st_size}:{st.st_mtime_ns}:{st.st_ino}".encode()
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+
+def _read(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(READ_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+class MediaServer:
+    # Serves post video/audio from UPLOAD_FOLDER/<kind>/ under fingerprinted
+    # URLs (/media/<kind>/<fingerprint>/<name>), so responses can be cached
+    # forever. Supports single and multiple byte ranges and If-Range. The
+    # bytes go out through the front server (MEDIA_ACCEL_PREFIX for nginx
+    # X-Accel-Redirect, MEDIA_X_SENDFILE for X-Sendfile) when configured,
+    # else whole files through the WSGI file wrapper, which gunicorn turns
+    # into sendfile().
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MEDIA_ACCEL_PREFIX', None)
+        app.config.setdefault('MEDIA_X_SENDFILE', False)
+        app.config.setdefault('MEDIA_MAX_AGE', 365 * 24 * 3600)
+        app.config.setdefault('MEDIA_MAX_RANGES', 16)
+        self.app = app
+        app.add_url_rule('/media/<kind>/<fingerprint>/<filename>', 'media', self.serve)
+        app.add_template_global(self.url, 'media_url')
+
+    def _path(self, kind, filename):
+        if kind not in MEDIA_EXTENSIONS or not filename or '/' in filename or filename.startswith('.'):
+            return None
+        path = os.path.join(self.app.config['UPLOAD_FOLDER'], kind, filename)
+        return path if os.path.isfile(path) else None
+
+    def url(self, kind, filename):
+        path = self._path(kind, filename)
+        if path is None:
+            return url_for('static', filename=f'uploads/{kind}/{filename}')
+        return url_for('media', kind=kind, fingerprint=_fingerprint(os.stat(path)), filename=filename)
+
+    def serve(self, kind, fingerprint, filename):
+        path = self._path(kind, filename)
+        if path is None:
+            abort(404)
+        st = os.stat(path)
+        current = _fingerprint(st)
+        if fingerprint != current:
+            # Old link to a replaced file: point at the current one, uncached
+            response = redirect(url_for('media', kind=kind, fingerprint=current, filename=filename))
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+        size = st.st_size
+        etag = f'"{current}"'
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        headers = {
+            'Accept-Ranges': 'bytes',
+            'Cache-Control': f"public, max-age={self.app.config['MEDIA_MAX_AGE']}, immutable",
+            'ETag': etag,
+            'Last-Modified': http_date(st.st_mtime),
+        }
+        if current in request.if_none_match:
+            return Response(status=304, headers=headers)
+
+        # The front server handles ranges and conditionals for offloaded files
+        accel = self.app.config['MEDIA_ACCEL_PREFIX']
+        if accel:
+            headers['X-Accel-Redirect'] = f"{accel.rstrip('/')}/{kind}/{filename}"
+            return Response(mimetype=mimetype, headers=headers)
+        if self.app.config['MEDIA_X_SENDFILE']:
+            headers['X-Sendfile'] = path
+            return Response(mimetype=mimetype, headers=headers)
+
+        ranges = self._ranges(size, etag, headers['Last-Modified'])
+        if ranges == []:
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+        if ranges is not None and len(ranges) > 1:
+            return self._multipart(path, ranges, size, mimetype, headers)
+
+        start, stop = ranges[0] if ranges else (0, size)
+        if ranges:
+            headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+        file_wrapper = request.environ.get('wsgi.file_wrapper')
+        if request.method == 'HEAD':
+            body = []
+        elif file_wrapper is not None and not ranges:
+            # Whole file: gunicorn sends it with sendfile(). Not for ranges:
+            # a wrapper reads to EOF, and only some servers stop at
+            # Content-Length, so those get the bounded read loop
+            body = file_wrapper(open(path, 'rb'), READ_SIZE)
+        else:
+            body = _read(path, start, stop - start)
+        response = Response(body, status=206 if ranges else 200, mimetype=mimetype, headers=headers,
+                            direct_passthrough=True)
+        response.content_length = stop - start
+        return response
+
+    def _ranges(self, size, etag, last_modified):
+        # None: send the whole file; []: unsatisfiable; else [(start, stop)]
+        header = request.headers.get('Range')
+        if not header or request.method not in ('GET', 'HEAD'):
+            return None
+        if_range = request.headers.get('If-Range')
+        if if_range and if_range.strip() not in (etag, last_modified):
+            return None
+        parsed = parse_range_header(header)
+        if parsed is None or parsed.units != 'bytes':
+            return None
+        ranges = []
+        for start, stop in parsed.ranges:
+            if start < 0:
+                start, stop = max(size + start, 0), size
+            else:
+                stop = size if stop is None else min(stop, size)
+            if start < stop:
+                ranges.append((start, stop))
+        if len(ranges) > self.app.config['MEDIA_MAX_RANGES']:
+            return None
+        ranges.sort()
+        merged = []
+        for start, stop in ranges:
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(stop, merged[-1][1]))
+            else:
+                merged.append((start, stop))
+        return merged
+
+    def _multipart(self, path, ranges, size, mimetype, headers):
+        boundary = os.urandom(12).hex()
+        parts = [(f"\r\n--{boundary}\r\nContent-Type: {mimetype}\r\n"
+                  f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n").encode()
+                 for start, stop in ranges]
+        closing = f"\r\n--{boundary}--\r\n".encode()
+        length = sum(len(p) for p in parts) + sum(stop - start for start, stop in ranges) + len(closing)
+
+        def generate():
+            for part, (start, stop) in zip(parts, ranges):
+                yield part
+                yield from _read(path, start, stop - start)
+            yield closing
+
+        response = Response([] if request.method == 'HEAD' else generate(), status=206,
+                            mimetype=f'multipart/byteranges; boundary={boundary}', headers=headers,
+                            direct_passthrough=True)
+        response.content_length = length
+        return response
+
+
+media_server = MediaServer()
@@ -0,0 +1,188 @@
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import g, request
+
+from counters import BufferedWriter
+from sqlstats import query_count, query_time
+
+try:
+    import fcntl
+except ImportError:  # Windows: one server process, a thread lock does
+    fcntl = None
+
+# Request latency histogram bucket bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+RETIRED = 'retired.json'  # summed snapshots of workers that have exited
+
+
+def _new_stats():
+    return {'count': 0, 'sum': 0.0, 'buckets': [0] * (len(BUCKETS) + 1),
+            'status': {}, 'sql_count': 0, 'sql_time': 0.0}
+
+
+def _merge(merged, snapshot):
+    for endpoint, stats in snapshot.items():
+        total = merged[endpoint]
+        for key in ('count', 'sum', 'sql_count', 'sql_time'):
+            total[key] += stats[key]
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], stats['buckets'])]
+        for status, n in stats['status'].items():
+            total['status'][status] = total['status'].get(status, 0) + n
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # being replaced right now
+
+
+def _alive(pid):
+    if os.name != 'posix':
+        return True  # os.kill(pid, 0) would signal the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Metrics(BufferedWriter):
+    # Per-endpoint latency, status codes and SQL usage. Each worker keeps
+    # cumulative stats in memory and periodically writes a snapshot to
+    # METRICS_DIR/<pid>-<start>.json (unique, so a reused pid can't
+    # overwrite it); the scrape endpoint sums all snapshots, so the numbers
+    # cover every gunicorn worker. Snapshots of exited workers are folded
+    # into retired.json, so totals never go backwards and files don't pile up.
+    config_key = 'METRICS_FLUSH_INTERVAL'
+    default_interval = 15
+    thread_name = 'metrics'
+
+    def __init__(self, app=None):
+        self._stats = defaultdict(_new_stats)
+        self._snapshot = (None, None)  # (pid, file name)
+        self._collect_lock = threading.Lock()
+        super().__init__(app)
+
+    def init_app(self, app):
+        super().init_app(app)
+        app.config.setdefault('METRICS_DIR', os.path.join(app.instance_path, 'metrics'))
+        # Run first, so the time spent in other hooks is measured too
+        app.before_request_funcs.setdefault(None, []).insert(0, self._start_timer)
+        app.after_request(self._record)
+
+    def _start_timer(self):
+        g.request_start = time.perf_counter()
+
+    def _record(self, response):
+        start = g.get('request_start')
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unknown'
+        status = str(response.status_code)
+        with self._lock:
+            stats = self._stats[endpoint]
+            stats['count'] += 1
+            stats['sum'] += elapsed
+            stats['buckets'][bisect_left(BUCKETS, elapsed)] += 1
+            stats['status'][status] = stats['status'].get(status, 0) + 1
+            stats['sql_count'] += query_count()
+            stats['sql_time'] += query_time()
+        self._touched()
+        return response
+
+    # Snapshots are cumulative: nothing is drained or restored
+    def _drain(self):
+        return json.loads(json.dumps(self._stats)) if self._stats else None
+
+    def _restore(self, batch):
+        pass
+
+    def _write(self, batch):
+        folder = self.app.config['METRICS_DIR']
+        os.makedirs(folder, exist_ok=True)
+        pid, name = self._snapshot
+        if pid != os.getpid():
+            name = f"{os.getpid()}-{time.time_ns()}.json"
+            self._snapshot = (os.getpid(), name)
+        path = os.path.join(folder, name)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(batch, f)
+        os.replace(path + '.tmp', path)
+        return len(batch)
+
+    def _retire(self, folder):
+        # Folds the snapshots of exited workers into RETIRED (caller holds the lock)
+        dead = [path for path in glob.glob(os.path.join(folder, '*-*.json'))
+                if not _alive(int(os.path.basename(path).split('-')[0]))]
+        if not dead:
+            return
+        retired = defaultdict(_new_stats)
+        _merge(retired, _load(os.path.join(folder, RETIRED)) or {})
+        for path in dead:
+            _merge(retired, _load(path) or {})
+        target = os.path.join(folder, RETIRED)
+        with open(target + '.tmp', 'w') as f:
+            json.dump(retired, f)
+        os.replace(target + '.tmp', target)
+        for path in dead:
+            os.remove(path)
+
+    def collect(self):
+        self.flush()
+        folder = self.app.config['METRICS_DIR']
+        merged = defaultdict(_new_stats)
+        if not os.path.isdir(folder):
+            return merged
+        # Locked, so a concurrent scrape can't retire a file between our reads
+        with open(os.path.join(folder, '.lock'), 'w') as lock, self._collect_lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            self._retire(folder)
+            for path in glob.glob(os.path.join(folder, '*.json')):
+                snapshot = _load(path)
+                if snapshot is not None:
+                    _merge(merged, snapshot)
+        return merged
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = [
+            '# HELP http_request_duration_seconds Request latency per endpoint.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        merged = sorted(self.collect().items())
+        for endpoint, stats in merged:
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ('+Inf',), stats['buckets']):
+                cumulative += n
+                lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {stats["sum"]}')
+            lines.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {stats["count"]}')
+        lines += ['# HELP http_requests_total Responses per endpoint and status code.',
+                  '# TYPE http_requests_total counter']
+        for endpoint, stats in merged:
+            for status, n in sorted(stats['status'].items()):
+                lines.append(f'http_requests_total{{endpoint="{endpoint}",status="{status}"}} {n}')
+        lines += ['# HELP sql_statements_total SQL statements run per endpoint.',
+                  '# TYPE sql_statements_total counter']
+        lines += [f'sql_statements_total{{endpoint="{e}"}} {s["sql_count"]}' for e, s in merged]
+        lines += ['# HELP sql_duration_seconds_total Time spent in SQL per endpoint.',
+                  '# TYPE sql_duration_seconds_total counter']
+        lines += [f'sql_duration_seconds_total{{endpoint="{e}"}} {s["sql_time"]}' for e, s in merged]
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
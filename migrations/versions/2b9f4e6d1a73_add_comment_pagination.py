@@ -0,0 +1,35 @@
+"""Add comment count to Post and comment keyset index
+
+Revision ID: 2b9f4e6d1a73
+Revises: 8e2d5c7a4f91
+Create Date: 2026-10-17 22:05:37.402816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b9f4e6d1a73'
+down_revision = '8e2d5c7a4f91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.create_index('ix_comment_post_created_at_id', ['post_id', 'created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('comment_count', sa.Integer(), nullable=True))
+
+    op.execute("UPDATE post SET comment_count = (SELECT COUNT(*) FROM comment WHERE comment.post_id = post.id)")
+
+
+def downgrade():
+    # recreate='never': a SQLite table rebuild would drop the post_fts triggers
+    with op.batch_alter_table('post', schema=None, recreate='never') as batch_op:
+        batch_op.drop_column('comment_count')
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.drop_index('ix_comment_post_created_at_id')
@@ -0,0 +1,30 @@
+"""Add pre-rendered HTML to Post
+
+Revision ID: 3b8e51c2d9a4
+Revises: acfb4d3cd947
+Create Date: 2026-10-17 09:12:40.518233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8e51c2d9a4'
+down_revision = 'acfb4d3cd947'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_html', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('html_version', sa.String(length=64), nullable=True))
+
+    # Existing rows are rendered lazily until `flask render-posts` is run
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_column('html_version')
+        batch_op.drop_column('content_html')
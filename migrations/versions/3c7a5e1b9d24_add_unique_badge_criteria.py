@@ -0,0 +1,45 @@
+"""Make badge.criteria unique
+
+Revision ID: 3c7a5e1b9d24
+Revises: b5d81f3e6a27
+Create Date: 2026-10-17 17:41:26.583019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c7a5e1b9d24'
+down_revision = 'b5d81f3e6a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Merge duplicate badges (from requests adding a missing badge at the
+    # same time) into the oldest one. With --sql there are no rows to read.
+    if not op.get_context().as_sql:
+        conn = op.get_bind()
+        rows = conn.execute(sa.text(
+            "SELECT criteria, id FROM badge WHERE criteria IS NOT NULL ORDER BY criteria, id")).all()
+        kept = {}
+        for criteria, badge_id in rows:
+            if criteria not in kept:
+                kept[criteria] = badge_id
+                continue
+            keep = kept[criteria]
+            conn.execute(sa.text(
+                "DELETE FROM user_badges WHERE badge_id = :dup AND user_id IN "
+                "(SELECT user_id FROM user_badges WHERE badge_id = :keep)"), {'dup': badge_id, 'keep': keep})
+            conn.execute(sa.text("UPDATE user_badges SET badge_id = :keep WHERE badge_id = :dup"),
+                         {'dup': badge_id, 'keep': keep})
+            conn.execute(sa.text("DELETE FROM badge WHERE id = :dup"), {'dup': badge_id})
+
+    with op.batch_alter_table('badge', schema=None) as batch_op:
+        batch_op.create_index('uq_badge_criteria', ['criteria'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('badge', schema=None) as batch_op:
+        batch_op.drop_index('uq_badge_criteria')
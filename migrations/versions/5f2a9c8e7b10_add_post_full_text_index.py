@@ -0,0 +1,50 @@
+"""Add full-text search index for posts
+
+Revision ID: 5f2a9c8e7b10
+Revises: 9d04c7a1e6f3
+Create Date: 2026-10-17 13:02:51.877310
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2a9c8e7b10'
+down_revision = '9d04c7a1e6f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite FTS5 only; other databases fall back to LIKE search
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("""CREATE VIRTUAL TABLE post_fts USING fts5(
+        title, summary, content,
+        content='post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""")
+    op.execute("""CREATE TRIGGER post_fts_ai AFTER INSERT ON post BEGIN
+        INSERT INTO post_fts(rowid, title, summary, content)
+        VALUES (new.id, new.title, new.summary, new.content);
+    END""")
+    op.execute("""CREATE TRIGGER post_fts_ad AFTER DELETE ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, old.summary, old.content);
+    END""")
+    op.execute("""CREATE TRIGGER post_fts_au AFTER UPDATE OF title, summary, content ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, old.summary, old.content);
+        INSERT INTO post_fts(rowid, title, summary, content)
+        VALUES (new.id, new.title, new.summary, new.content);
+    END""")
+    op.execute("INSERT INTO post_fts(post_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TRIGGER IF EXISTS post_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS post_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS post_fts_ai")
+    op.execute("DROP TABLE IF EXISTS post_fts")
@@ -0,0 +1,33 @@
+"""Make analytics.date unique
+
+Revision ID: 6d1f3b8a2c47
+Revises: 2b9f4e6d1a73
+Create Date: 2026-10-18 10:14:22.603518
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '6d1f3b8a2c47'
+down_revision = '2b9f4e6d1a73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Fold duplicate day rows (from concurrent first flushes) into the oldest
+    # one; its visitor sketch is kept, the duplicates' are dropped
+    op.execute("""UPDATE analytics SET
+        page_views = (SELECT SUM(COALESCE(a.page_views, 0)) FROM analytics a WHERE a.date = analytics.date),
+        unique_visitors = (SELECT MAX(a.unique_visitors) FROM analytics a WHERE a.date = analytics.date)
+        WHERE id IN (SELECT MIN(id) FROM analytics WHERE date IS NOT NULL GROUP BY date HAVING COUNT(*) > 1)""")
+    op.execute("DELETE FROM analytics WHERE date IS NOT NULL AND id NOT IN (SELECT MIN(id) FROM analytics GROUP BY date)")
+
+    with op.batch_alter_table('analytics', schema=None) as batch_op:
+        batch_op.create_index('uq_analytics_date', ['date'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('analytics', schema=None) as batch_op:
+        batch_op.drop_index('uq_analytics_date')
@@ -0,0 +1,33 @@
+"""Add import source path and hash to Post
+
+Revision ID: 8e2d5c7a4f91
+Revises: a7e3b9d05c18
+Create Date: 2026-10-17 21:32:45.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e2d5c7a4f91'
+down_revision = 'a7e3b9d05c18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A unique index, not a constraint: on SQLite a constraint would rebuild
+    # post, which drops the post_fts triggers
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('source_path', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('source_hash', sa.String(length=40), nullable=True))
+        batch_op.create_index('uq_post_source_path', ['source_path'], unique=True)
+
+
+def downgrade():
+    # recreate='never': SQLite's own DROP COLUMN keeps the post_fts triggers
+    with op.batch_alter_table('post', schema=None, recreate='never') as batch_op:
+        batch_op.drop_index('uq_post_source_path')
+        batch_op.drop_column('source_hash')
+        batch_op.drop_column('source_path')
@@ -0,0 +1,26 @@
+"""Add visitor sketch to Analytics
+
+Revision ID: 9d04c7a1e6f3
+Revises: 3b8e51c2d9a4
+Create Date: 2026-10-17 11:40:05.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d04c7a1e6f3'
+down_revision = '3b8e51c2d9a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('analytics', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('visitor_sketch', sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('analytics', schema=None) as batch_op:
+        batch_op.drop_column('visitor_sketch')
@@ -0,0 +1,33 @@
+"""Widen user.password_hash for PostgreSQL
+
+Revision ID: a7e3b9d05c18
+Revises: f1c9e07b3a5d
+Create Date: 2026-10-17 19:26:02.871540
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e3b9d05c18'
+down_revision = 'f1c9e07b3a5d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite never enforced the length; werkzeug's scrypt hashes don't fit in 128
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=128),
+               type_=sa.String(length=256),
+               existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=256),
+               type_=sa.String(length=128),
+               existing_nullable=True)
@@ -0,0 +1,38 @@
+"""Add post_like table
+
+Revision ID: b5d81f3e6a27
+Revises: e4a6d2f9c135
+Create Date: 2026-10-17 17:12:09.415226
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d81f3e6a27'
+down_revision = 'e4a6d2f9c135'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('post_like',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'post_id')
+    )
+    with op.batch_alter_table('post_like', schema=None) as batch_op:
+        batch_op.create_index('ix_post_like_post_id', ['post_id'], unique=False)
+
+    # Earlier likes were anonymous counts; post.likes keeps them as they are
+
+
+def downgrade():
+    with op.batch_alter_table('post_like', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_like_post_id')
+
+    op.drop_table('post_like')
@@ -0,0 +1,27 @@
+"""Add post listing indexes for keyset pagination
+
+Revision ID: c71e4b0f2a58
+Revises: 5f2a9c8e7b10
+Create Date: 2026-10-17 14:26:13.640952
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71e4b0f2a58'
+down_revision = '5f2a9c8e7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_post_category_created_at_id', ['category_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_category_created_at_id')
+        batch_op.drop_index('ix_post_created_at_id')
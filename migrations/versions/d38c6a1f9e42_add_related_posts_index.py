@@ -0,0 +1,39 @@
+"""Add related posts index
+
+Revision ID: d38c6a1f9e42
+Revises: 3c7a5e1b9d24
+Create Date: 2026-10-17 18:03:51.207334
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd38c6a1f9e42'
+down_revision = '3c7a5e1b9d24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('post_related',
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('related_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+    sa.ForeignKeyConstraint(['related_id'], ['post.id'], ),
+    sa.PrimaryKeyConstraint('post_id', 'related_id')
+    )
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('minhash', sa.LargeBinary(), nullable=True))
+
+    # Existing posts are indexed with `flask related-index`
+
+
+def downgrade():
+    # recreate='never': a SQLite table rebuild would drop the post_fts triggers
+    with op.batch_alter_table('post', schema=None, recreate='never') as batch_op:
+        batch_op.drop_column('minhash')
+
+    op.drop_table('post_related')
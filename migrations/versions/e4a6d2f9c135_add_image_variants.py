@@ -0,0 +1,35 @@
+"""Add image variant manifests
+
+Revision ID: e4a6d2f9c135
+Revises: c71e4b0f2a58
+Create Date: 2026-10-17 16:05:38.112904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a6d2f9c135'
+down_revision = 'c71e4b0f2a58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_variants', sa.Text(), nullable=True))
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('avatar_variants', sa.Text(), nullable=True))
+
+    # Existing images get variants with `flask images-backfill`
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('avatar_variants')
+
+    # recreate='never': a SQLite table rebuild would drop the post_fts triggers
+    with op.batch_alter_table('post', schema=None, recreate='never') as batch_op:
+        batch_op.drop_column('image_variants')
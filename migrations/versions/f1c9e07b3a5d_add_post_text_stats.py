@@ -0,0 +1,63 @@
+"""Add word count and reading time to Post
+
+Revision ID: f1c9e07b3a5d
+Revises: d38c6a1f9e42
+Create Date: 2026-10-17 18:47:20.664019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c9e07b3a5d'
+down_revision = 'd38c6a1f9e42'
+branch_labels = None
+depends_on = None
+
+post = sa.table('post',
+    sa.column('id', sa.Integer),
+    sa.column('content', sa.Text),
+    sa.column('updated_at', sa.DateTime),
+    sa.column('word_count', sa.Integer),
+    sa.column('reading_time', sa.Integer),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('word_count', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('reading_time', sa.Integer(), nullable=True))
+
+    # Backfill in id batches (same rule as rendering.text_stats, 200 words/min);
+    # with --sql there are no rows to read, run `flask render-posts` instead
+    if op.get_context().as_sql:
+        return
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(post.c.id, post.c.content).where(post.c.id > last_id).order_by(post.c.id).limit(500)
+        ).all()
+        if not rows:
+            break
+        stats = []
+        for id, content in rows:
+            words = len(content.split()) if content else 0
+            stats.append({'post_id': id, 'words': words, 'minutes': max(1, round(words / 200))})
+        conn.execute(
+            post.update().where(post.c.id == sa.bindparam('post_id')).values(
+                word_count=sa.bindparam('words'),
+                reading_time=sa.bindparam('minutes'),
+                updated_at=post.c.updated_at,
+            ),
+            stats,
+        )
+        last_id = rows[-1].id
+
+
+def downgrade():
+    # recreate='never': a SQLite table rebuild would drop the post_fts triggers
+    with op.batch_alter_table('post', schema=None, recreate='never') as batch_op:
+        batch_op.drop_column('reading_time')
+        batch_op.drop_column('word_count')
@@ -11,16 +11,32 @@ user_badges = db.Table('user_badges',
     db.Column('earned_at', db.DateTime, default=datetime.utcnow)
 )
 
+# One row per (user, post) like; post.likes is the denormalized count
+post_like = db.Table('post_like',
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True),
+    db.Column('created_at', db.DateTime, default=datetime.utcnow),
+    db.Index('ix_post_like_post_id', 'post_id')
+)
+
+# Precomputed "related posts" lists, best score first (see related.py)
+post_related = db.Table('post_related',
+    db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True),
+    db.Column('related_id', db.Integer, db.ForeignKey('post.id'), primary_key=True),
+    db.Column('score', db.Float, nullable=False)
+)
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256)) # scrypt hashes are ~160 chars
     google_id = db.Column(db.String(100), unique=True, nullable=True)  # Google OAuth ID
     is_admin = db.Column(db.Boolean, default=False)
     
     # Profile & Gamification
     avatar = db.Column(db.String(255), default='default_avatar.png')
+    avatar_variants = db.Column(db.Text) # JSON manifest of resized copies (see images.py)
     bio = db.Column(db.Text)
     role = db.Column(db.String(20), default='reader') # reader, author, admin
     points = db.Column(db.Integer, default=0)
@@ -30,7 +46,7 @@ class User(UserMixin, db.Model):
     # Relationships
     posts = db.relationship('Post', backref='author_ref', lazy=True)
     comments = db.relationship('Comment', backref='author_ref', lazy=True)
-    badges = db.relationship('Badge', secondary=user_badges, lazy='subquery',
+    badges = db.relationship('Badge', secondary=user_badges, lazy='select',
                            backref=db.backref('users', lazy=True))
 
     def set_password(self, password):
@@ -58,6 +74,7 @@ class Post(db.Model):
     content = db.Column(db.Text, nullable=False)
     summary = db.Column(db.Text)
     image_url = db.Column(db.String(255))
+    image_variants = db.Column(db.Text) # JSON manifest of resized copies (see images.py)
     video_url = db.Column(db.String(255)) # [NEW]
     audio_url = db.Column(db.String(255)) # [NEW]
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -65,12 +82,33 @@ class Post(db.Model):
     status = db.Column(db.String(20), default='published') # draft, published
     views = db.Column(db.Integer, default=0)
     likes = db.Column(db.Integer, default=0)
+    comment_count = db.Column(db.Integer, default=0) # denormalized, kept in step by the comment routes
+    
+    # Sanitized HTML rendered on save (see rendering.py)
+    content_html = db.deferred(db.Column(db.Text))
+    html_version = db.Column(db.String(64))
+    minhash = db.deferred(db.Column(db.LargeBinary)) # similarity signature (see related.py)
+    
+    # Text statistics, computed on save (see rendering.py)
+    word_count = db.Column(db.Integer, default=0)
+    reading_time = db.Column(db.Integer, default=1) # minutes
+    
+    # Markdown file the post was imported from and its hash (see importer.py)
+    source_path = db.Column(db.String(255))
+    source_hash = db.Column(db.String(40))
     
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     
     comments = db.relationship('Comment', backref='post', lazy=True, cascade="all, delete-orphan")
 
+    # Keyset pagination order (newest first), overall and per category
+    __table_args__ = (
+        db.Index('ix_post_created_at_id', 'created_at', 'id'),
+        db.Index('ix_post_category_created_at_id', 'category_id', 'created_at', 'id'),
+        db.Index('uq_post_source_path', 'source_path', unique=True),  # one post per imported file
+    )
+
     def __init__(self, *args, **kwargs):
         super(Post, self).__init__(*args, **kwargs)
         if self.title:
@@ -78,8 +116,7 @@ class Post(db.Model):
     
     @property
     def read_time(self):
-        words = len(self.content.split()) if self.content else 0
-        return max(1, round(words / 200))
+        return self.reading_time or 1
 
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -93,6 +130,11 @@ class Comment(db.Model):
     # If user is not logged in
     author_name = db.Column(db.String(80)) 
 
+    # Keyset pagination of a post's comments (newest first)
+    __table_args__ = (
+        db.Index('ix_comment_post_created_at_id', 'post_id', 'created_at', 'id'),
+    )
+
 class Badge(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
@@ -100,11 +142,20 @@ class Badge(db.Model):
     icon = db.Column(db.String(50)) # Valid lucide icon name
     criteria = db.Column(db.String(100)) # Internal code for award logic
 
+    __table_args__ = (
+        db.Index('uq_badge_criteria', 'criteria', unique=True),  # one badge per rule, see badges.py
+    )
+
 class Analytics(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, default=datetime.utcnow().date)
     page_views = db.Column(db.Integer, default=0)
     unique_visitors = db.Column(db.Integer, default=0)
+    visitor_sketch = db.deferred(db.Column(db.LargeBinary)) # HyperLogLog registers (see analytics.py)
+
+    __table_args__ = (
+        db.Index('uq_analytics_date', 'date', unique=True),  # one row per day
+    )
 
 class SiteSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,122 @@
+import hashlib
+import threading
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import request, session, g, current_app, make_response
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+
+from cache import LRUCache, VersionStamp
+from compression import compressor, compress
+from site_context import layout_stamp
+
+# Bumped on post, comment and settings writes (settings/categories bump
+# layout_stamp, which is part of the cache generation too)
+content_stamp = VersionStamp('content')
+
+
+class PageCache:
+    # Full-page cache for anonymous GET requests, keyed on host + path +
+    # query string. Entries hold the rendered body with a strong ETag and
+    # Last-Modified, so conditional requests are answered with 304, plus
+    # the body in each coding it was served in, compressed once.
+    def __init__(self, app=None):
+        self._pages = LRUCache(maxsize=512)
+        self._generation = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PAGE_CACHE_SIZE', 512)
+        self._pages.maxsize = app.config['PAGE_CACHE_SIZE']
+
+    def cached(self, on_hit=None, csrf_cookie=False):
+        # on_hit(meta) runs on cache hits, for side effects such as view counts;
+        # a view can fill meta through g.page_cache_meta while rendering.
+        # csrf_cookie: the page has a form, whose token (per session, so not
+        # cacheable) is handed out in a cookie instead, see post.html
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self._cacheable():
+                    response = make_response(view(*args, **kwargs))
+                else:
+                    key = (request.host, request.full_path)
+                    generation, entry = self._lookup(key)
+                    if entry is None:
+                        g.page_cache_meta = {}
+                        response = make_response(view(*args, **kwargs))
+                        if response.status_code == 200 and not response.direct_passthrough:
+                            response = self._respond(self._store(key, response, g.page_cache_meta, generation))
+                    else:
+                        if on_hit is not None:
+                            on_hit(entry['meta'])
+                        response = self._respond(entry)
+                if csrf_cookie and request.method == 'GET' and not current_user.is_authenticated:
+                    response.set_cookie('csrf_token', generate_csrf(), samesite='Lax',
+                                        secure=request.is_secure)
+                return response
+            return wrapper
+        return decorator
+
+    def _cacheable(self):
+        if request.method != 'GET' or current_app.debug:
+            return False
+        if current_user.is_authenticated:
+            return False
+        # Pages carrying flashed messages are personal
+        return not session.get('_flashes')
+
+    def _current(self):
+        return (content_stamp.current(), layout_stamp.current())
+
+    def _lookup(self, key):
+        generation = self._current()
+        with self._lock:
+            if generation != self._generation:
+                self._pages.clear()
+                self._generation = generation
+        return generation, self._pages.get(key)
+
+    def _store(self, key, response, meta, generation):
+        body = response.get_data()
+        entry = {
+            'body': body,
+            'encoded': {},  # coding -> compressed body
+            'mimetype': response.mimetype,
+            'etag': hashlib.sha1(body).hexdigest(),
+            'last_modified': datetime.now(timezone.utc).replace(microsecond=0),
+            'meta': meta,
+        }
+        # generation is from before rendering: if a write bumped it since,
+        # this page may predate the write, so it is served but not kept
+        with self._lock:
+            if generation == self._generation == self._current():
+                self._pages.set(key, entry)
+        return entry
+
+    def _respond(self, entry):
+        coding = compressor.choose(entry['mimetype'], len(entry['body']))
+        if coding is None:
+            response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+            response.set_etag(entry['etag'])
+        else:
+            body = entry['encoded'].get(coding)
+            if body is None:
+                body = entry['encoded'][coding] = compress(entry['body'], coding)
+            response = current_app.response_class(body, mimetype=entry['mimetype'])
+            response.headers['Content-Encoding'] = coding
+            response.set_etag(f"{entry['etag']}-{coding}")
+            response.vary.add('Accept-Encoding')
+        response.last_modified = entry['last_modified']
+        response.cache_control.no_cache = True  # always revalidate; 304 is cheap
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+
+    def invalidate(self):
+        content_stamp.bump()
+
+
+page_cache = PageCache()
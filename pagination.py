@@ -0,0 +1,110 @@
+import base64
+import json
+import threading
+from datetime import datetime
+
+from extensions import db
+from cache import LRUCache
+from site_context import layout_stamp
+
+
+class KeysetPagination:
+    # Same shape as Flask-SQLAlchemy's Pagination where it matters to the
+    # templates (items, has_next, has_prev, total), plus opaque cursors
+    def __init__(self, items, next_cursor, prev_cursor, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(values):
+    values = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    # Returns None for anything malformed, which callers treat as "first page"
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        return [datetime.fromisoformat(v['dt']) if isinstance(v, dict) else v for v in values]
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def _matches(expr, value):
+    # Cursors come from the client: each value must fit its key's column
+    if isinstance(expr.type, db.DateTime):
+        return isinstance(value, datetime)
+    if isinstance(value, bool):
+        return False
+    if isinstance(expr.type, db.Integer):
+        return isinstance(value, int)
+    return isinstance(value, (int, float))  # e.g. the bm25 rank
+
+
+def _after(keys, values, reverse=False):
+    # Row-value comparison spelled out, since key directions may be mixed:
+    # (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...
+    clauses = []
+    for i, ((expr, desc), value) in enumerate(zip(keys, values)):
+        later = expr < value if desc != reverse else expr > value
+        clauses.append(db.and_(*[k[0] == v for k, v in zip(keys[:i], values[:i])], later))
+    return db.or_(*clauses)
+
+
+def keyset_paginate(query, keys, per_page, after=None, before=None, total=None):
+    # keys: [(column expression, descending), ...], the last one unique (id).
+    # Cursors hold the key values of the boundary row, so each page is an
+    # index range scan instead of COUNT(*) + OFFSET.
+    values = decode_cursor(after or before or '')
+    if values is not None and (len(values) != len(keys)
+                               or not all(_matches(expr, v) for (expr, _), v in zip(keys, values))):
+        values = None
+    backwards = values is not None and not after
+    if values is not None:
+        query = query.filter(_after(keys, values, reverse=backwards))
+    order = [expr.asc() if desc == backwards else expr.desc() for expr, desc in keys]
+    rows = query.add_columns(*[expr for expr, _ in keys]).order_by(None).order_by(*order) \
+        .limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+    items = [row[0] for row in rows]
+    first = encode_cursor(list(rows[0][1:])) if rows else None
+    last = encode_cursor(list(rows[-1][1:])) if rows else None
+    if backwards:
+        return KeysetPagination(items, next_cursor=last, prev_cursor=first if more else None, total=total)
+    return KeysetPagination(items, next_cursor=last if more else None,
+                            prev_cursor=first if values is not None else None, total=total)
+
+
+_counts = LRUCache(maxsize=256)
+_counts_generation = None
+_counts_lock = threading.Lock()
+
+
+def cached_count(query, key):
+    # Total for a filtered listing, recomputed only after posts change
+    global _counts_generation
+    generation = layout_stamp.current()
+    with _counts_lock:
+        if generation != _counts_generation:
+            _counts.clear()
+            _counts_generation = generation
+    total = _counts.get(key)
+    if total is None:
+        total = query.order_by(None).count()
+        _counts.set(key, total)
+    return total
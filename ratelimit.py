@@ -0,0 +1,130 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+from flask import jsonify, request
+from flask_login import current_user
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single server process, the thread lock is enough
+    fcntl = None
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+SLOT = struct.Struct('<Qdd')  # key hash, tokens, last refill (unix time)
+GROUP = 8  # slots per hash group, the unit of locking and eviction
+
+
+def parse_limit(limit):
+    # '5/minute' -> (capacity 5, refill rate in tokens per second)
+    count, period = limit.split('/')
+    return int(count), int(count) / PERIODS[period.strip()]
+
+
+class RateLimiter:
+    # Token buckets per endpoint and client (IP, plus user id when logged
+    # in), shared by every gunicorn worker through a memory-mapped file:
+    # fixed-size slots in groups of GROUP, a key hashes to one group, which
+    # is locked with fcntl while its bucket is refilled and charged. When a
+    # group is full the longest-idle bucket is reused. A check is a hash,
+    # a lock and a few struct reads; nothing touches the database.
+    # RATE_LIMITS maps endpoint -> 'count/period' for POST requests.
+    def __init__(self, app=None):
+        self.app = None
+        self._limits = {}
+        self._mm = None
+        self._fd = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMITS', {})
+        app.config.setdefault('RATE_LIMIT_ENABLED', True)
+        app.config.setdefault('RATE_LIMIT_FILE', os.path.join(app.instance_path, 'ratelimit.bin'))
+        app.config.setdefault('RATE_LIMIT_SLOTS', 65536)
+        self.app = app
+        self._limits = {endpoint: parse_limit(limit) for endpoint, limit in app.config['RATE_LIMITS'].items()}
+        app.before_request(self._check)
+
+    def _open(self):
+        # Per process: fcntl locks belong to the process that takes them
+        if self._pid == os.getpid():
+            return
+        path = self.app.config['RATE_LIMIT_FILE']
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = self.app.config['RATE_LIMIT_SLOTS'] // GROUP * GROUP * SLOT.size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size != size:
+            if fcntl:
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, 0)  # slot count changed: start over
+                os.ftruncate(fd, size)
+            if fcntl:
+                fcntl.lockf(fd, fcntl.LOCK_UN)
+        self._mm = mmap.mmap(fd, size)
+        self._fd = fd
+        self._pid = os.getpid()
+
+    def hit(self, key, capacity, rate, now=None):
+        # Takes a token from key's bucket; returns 0 if allowed, else the
+        # seconds until a token is available
+        now = time.time() if now is None else now
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') | 1
+        with self._lock:
+            self._open()
+            groups = len(self._mm) // (GROUP * SLOT.size)
+            start = digest % groups * GROUP * SLOT.size
+            if fcntl:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, GROUP * SLOT.size, start)
+            try:
+                offset, tokens, victim, oldest = None, capacity, start, math.inf
+                for slot in range(start, start + GROUP * SLOT.size, SLOT.size):
+                    stored, stored_tokens, stamp = SLOT.unpack_from(self._mm, slot)
+                    if stored == digest:
+                        offset = slot
+                        tokens = min(capacity, stored_tokens + (now - stamp) * rate)
+                        break
+                    if stamp < oldest:
+                        victim, oldest = slot, stamp
+                if offset is None:
+                    offset = victim
+                if tokens >= 1:
+                    SLOT.pack_into(self._mm, offset, digest, tokens - 1, now)
+                    return 0
+                SLOT.pack_into(self._mm, offset, digest, tokens, now)
+                return (1 - tokens) / rate
+            finally:
+                if fcntl:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, GROUP * SLOT.size, start)
+
+    def _check(self):
+        limit = self._limits.get(request.endpoint)
+        if limit is None or request.method != 'POST' or not self.app.config['RATE_LIMIT_ENABLED']:
+            return None
+        # Charged to the IP and, when logged in, to the user as well, so
+        # several accounts behind one address still share its budget
+        clients = [f"ip:{request.remote_addr}"]
+        if current_user.is_authenticated:
+            clients.append(f"user:{current_user.id}")
+        wait = max(self.hit(f"{request.endpoint}|{client}", *limit) for client in clients)
+        if not wait:
+            return None
+        retry_after = math.ceil(wait)
+        message = f"Juda ko'p urinish. {retry_after} soniyadan keyin qayta urinib ko'ring."
+        if request.accept_mimetypes.best == 'application/json' or request.is_json:
+            response = jsonify({'status': 'limited', 'error': message})
+        else:
+            response = self.app.response_class(message, mimetype='text/plain')
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+
+rate_limiter = RateLimiter()
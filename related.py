@@ -0,0 +1,209 @@
+import os
+import re
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from extensions import db
+from models import Post, post_related
+
+# MinHash signatures over the words of title + summary + content. Two
+# posts' signatures agree in about as many slots as the Jaccard similarity
+# of their word sets; posts in the same category get a small bonus, so
+# they fill the list when nothing is textually close.
+NUM_HASHES = 128
+BAND_ROWS = 2  # LSH bands of 2 slots: pairs with Jaccard ~0.15+ become candidates
+BAND_NEIGHBOURS = 4
+TOP_N = 6
+CATEGORY_BONUS = 0.05
+MIN_WORD = 4
+
+# Multiply-shift hashing: h(x) = ((a*x + b) mod 2^64) >> 32, a odd.
+# Fixed seed: stored signatures must stay comparable across processes.
+_rng = np.random.default_rng(20241017)
+_A = _rng.integers(1, 2**63, NUM_HASHES, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2**63, NUM_HASHES, dtype=np.uint64)
+_EMPTY = np.full(NUM_HASHES, 2**32 - 1, dtype=np.uint32)
+
+
+def signature(*texts):
+    words = {w for text in texts if text for w in re.findall(r'\w+', text.lower()) if len(w) >= MIN_WORD}
+    if not words:
+        return _EMPTY
+    x = np.fromiter((zlib.crc32(w.encode()) for w in words), dtype=np.uint64, count=len(words))
+    h = np.multiply.outer(_A, x)
+    h += _B[:, None]
+    h >>= np.uint64(32)
+    return h.min(axis=1).astype(np.uint32)
+
+
+def _signature_batch(texts):
+    return np.stack([signature(*t) for t in texts])
+
+
+def _signatures():
+    # (ids, category ids, N x NUM_HASHES matrix) of every indexed post
+    rows = db.session.execute(
+        db.select(Post.id, Post.category_id, Post.minhash).where(Post.minhash.is_not(None))).all()
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    cats = np.array([r[1] or 0 for r in rows], dtype=np.int64)
+    sigs = np.frombuffer(b''.join(r[2] for r in rows), dtype=np.uint32).reshape(len(rows), NUM_HASHES)
+    return ids, cats, sigs
+
+
+def _scores(sig, cat, cats, sigs):
+    return (sigs == sig).mean(axis=1) + CATEGORY_BONUS * (cats == (cat or 0))
+
+
+def _top(post_id, scores, ids):
+    # [(related id, score)] best first, newest first among equal scores
+    keep = (ids != post_id) & (scores > 0)
+    scores, ids = scores[keep], ids[keep]
+    order = np.lexsort((-ids, -scores))[:TOP_N]
+    return [(int(ids[i]), float(scores[i])) for i in order]
+
+
+def _store(lists):
+    # lists: {post_id: [(related id, score)]}, replacing what is stored
+    if not lists:
+        return
+    db.session.execute(post_related.delete().where(post_related.c.post_id.in_(list(lists))))
+    rows = [{'post_id': post_id, 'related_id': related_id, 'score': score}
+            for post_id, pairs in lists.items() for related_id, score in pairs]
+    if rows:
+        db.session.execute(post_related.insert(), rows)
+
+
+def update_related(post):
+    # Call before commit, with the post added but not yet flushed since its
+    # last change: the signature goes out in the same INSERT/UPDATE, so a
+    # second flush cannot bump updated_at past the stored html_version.
+    # Stores its signature, its own top-N and every list it now belongs in
+    sig = signature(post.title, post.summary, post.content)
+    post.minhash = sig.tobytes()
+    db.session.flush()
+    ids, cats, sigs = _signatures()
+    scores = _scores(sig, post.category_id, cats, sigs)
+    lists = {post.id: _top(post.id, scores, ids)}
+
+    # Other lists change only if they hold this post or it now outranks their last entry
+    stored = db.session.execute(
+        db.select(post_related.c.post_id, db.func.min(post_related.c.score), db.func.count(),
+                  db.func.max(db.case((post_related.c.related_id == post.id, 1), else_=0)))
+        .group_by(post_related.c.post_id)).all()
+    stored = {post_id: (low, n, holds) for post_id, low, n, holds in stored}
+    for i, other in enumerate(ids.tolist()):
+        if other == post.id:
+            continue
+        low, n, holds = stored.get(other, (0, 0, 0))
+        if holds or (scores[i] > 0 and (n < TOP_N or scores[i] > low)):
+            lists[other] = _top(other, _scores(sigs[i], cats[i], cats, sigs), ids)
+    _store(lists)
+
+
+def remove_related(post_id):
+    # Call before deleting a post; lists that held it are recomputed
+    holders = db.session.scalars(
+        db.select(post_related.c.post_id).where(post_related.c.related_id == post_id)).all()
+    db.session.execute(post_related.delete().where(
+        (post_related.c.post_id == post_id) | (post_related.c.related_id == post_id)))
+    if not holders:
+        return
+    ids, cats, sigs = _signatures()
+    keep = ids != post_id
+    ids, cats, sigs = ids[keep], cats[keep], sigs[keep]
+    position = {post_id: i for i, post_id in enumerate(ids.tolist())}
+    _store({other: _top(other, _scores(sigs[position[other]], cats[position[other]], cats, sigs), ids)
+            for other in holders if other in position})
+
+
+def _candidate_pairs(cats, created, sigs):
+    # LSH: posts that agree on both slots of a band land next to each other
+    # when sorted by that band; each is paired with its next BAND_NEIGHBOURS
+    # in the same bucket (ties broken by another slot, so every band pairs
+    # different neighbours). Neighbours by date within a category are added
+    # for the bonus. Returns the pairs encoded as i * n + j, i < j.
+    n = len(sigs)
+    pairs = []
+
+    def neighbours(order, keys, window):
+        for step in range(1, window + 1):
+            a, b = order[:-step], order[step:]
+            same = keys[a] == keys[b]
+            pairs.append(np.minimum(a[same], b[same]) * n + np.maximum(a[same], b[same]))
+
+    for start in range(0, NUM_HASHES, BAND_ROWS):
+        keys = (sigs[:, start].astype(np.uint64) << np.uint64(32)) | sigs[:, start + 1]
+        order = np.lexsort((sigs[:, (start + BAND_ROWS) % NUM_HASHES], keys))
+        neighbours(order, keys, BAND_NEIGHBOURS)
+    neighbours(np.lexsort((created, cats)), cats, TOP_N)
+    return np.unique(np.concatenate(pairs))
+
+
+def rebuild_related(batch_size=500, workers=None):
+    # Recompute every signature and list; returns the number of posts.
+    # Signatures are computed in a process pool while the next batch loads.
+    keys, jobs, last_id = [], [], 0
+    # (forked, whatever the platform default, so workers inherit the engine;
+    # they drop its pool without closing the connections)
+    with ProcessPoolExecutor(workers or os.cpu_count(), mp_context=get_context('fork'),
+                             initializer=db.engine.dispose, initargs=(False,)) as pool:
+        while True:
+            batch = db.session.execute(
+                db.select(Post.id, Post.category_id, Post.created_at, Post.title, Post.summary, Post.content)
+                .where(Post.id > last_id).order_by(Post.id).limit(batch_size)).all()
+            if not batch:
+                break
+            keys += [(r[0], r[1] or 0, r[2].timestamp() if r[2] else 0) for r in batch]
+            jobs.append(pool.submit(_signature_batch, [r[3:] for r in batch]))
+            last_id = batch[-1][0]
+        sigs = np.concatenate([job.result() for job in jobs]) if jobs else None
+    db.session.execute(post_related.delete())
+    if not keys:
+        db.session.commit()
+        return 0
+
+    ids = np.array([k[0] for k in keys], dtype=np.int64)
+    cats = np.array([k[1] for k in keys], dtype=np.int64)
+    created = np.array([k[2] for k in keys])
+    n = len(ids)
+
+    encoded = _candidate_pairs(cats, created, sigs)
+    left, right = encoded // n, encoded % n
+    scores = np.empty(len(encoded))
+    for start in range(0, len(encoded), 100000):  # bounded memory for the N x 128 comparisons
+        i, j = left[start:start + 100000], right[start:start + 100000]
+        scores[start:start + 100000] = (sigs[i] == sigs[j]).mean(axis=1) + CATEGORY_BONUS * (cats[i] == cats[j])
+
+    # Both directions, then the best TOP_N per post (newest first on ties)
+    src = np.concatenate([left, right])
+    dst = np.concatenate([right, left])
+    scores = np.concatenate([scores, scores])
+    keep = scores > 0
+    src, dst, scores = src[keep], dst[keep], scores[keep]
+    order = np.lexsort((-ids[dst], -scores, src))
+    src, dst, scores = src[order], dst[order], scores[order]
+    first = np.searchsorted(src, src)  # index where each post's run starts
+    top = np.arange(len(src)) - first < TOP_N
+
+    table = Post.__table__
+    for start in range(0, n, batch_size):
+        db.session.execute(
+            table.update().where(table.c.id == db.bindparam('post_id'))
+            .values(minhash=db.bindparam('sig'), updated_at=table.c.updated_at),
+            [{'post_id': int(ids[k]), 'sig': sigs[k].tobytes()} for k in range(start, min(start + batch_size, n))])
+    rows = [{'post_id': int(ids[s]), 'related_id': int(ids[d]), 'score': float(x)}
+            for s, d, x in zip(src[top], dst[top], scores[top])]
+    for start in range(0, len(rows), 5000):
+        db.session.execute(post_related.insert(), rows[start:start + 5000])
+    db.session.commit()
+    return n
+
+
+def related_posts(post, limit=3):
+    return Post.query.options(db.defer(Post.content)) \
+        .join(post_related, post_related.c.related_id == Post.id) \
+        .filter(post_related.c.post_id == post.id) \
+        .order_by(post_related.c.score.desc(), Post.id.desc()).limit(limit).all()
@@ -0,0 +1,63 @@
+import hashlib
+import threading
+from datetime import datetime
+
+import markdown
+import bleach
+
+from cache import LRUCache
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'codehilite']
+WORDS_PER_MINUTE = 200
+ALLOWED_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'ul', 'ol', 'li', 'a', 'strong', 'em', 'code', 'pre', 'img', 'blockquote']
+ALLOWED_ATTRS = {'*': ['class'], 'a': ['href', 'rel'], 'img': ['src', 'alt']}
+
+# Changes whenever the markdown/bleach setup above changes, so HTML stored
+# with an older setup is treated as stale (run `flask render-posts` after edits)
+RENDER_SIGNATURE = hashlib.sha1(
+    repr((MARKDOWN_EXTENSIONS, ALLOWED_TAGS, sorted(ALLOWED_ATTRS.items()))).encode()
+).hexdigest()[:8]
+
+html_cache = LRUCache(maxsize=256)
+_local = threading.local()
+
+
+def render_markdown(text):
+    # Markdown instances are reusable but not thread-safe
+    md = getattr(_local, 'md', None)
+    if md is None:
+        md = _local.md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    html = md.reset().convert(text or '')
+    return bleach.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRS)
+
+
+def text_stats(text):
+    # (word count, reading time in minutes) of the markdown source
+    words = len(text.split()) if text else 0
+    return words, max(1, round(words / WORDS_PER_MINUTE))
+
+
+def html_version(post):
+    stamp = post.updated_at.isoformat() if post.updated_at else ''
+    return f"{RENDER_SIGNATURE}:{stamp}"
+
+
+def prerender_post(post):
+    # Save path: render once and store the sanitized HTML with its version
+    post.updated_at = datetime.utcnow()
+    post.content_html = render_markdown(post.content)
+    post.html_version = html_version(post)
+    post.word_count, post.reading_time = text_stats(post.content)
+
+
+def get_post_html(post):
+    version = html_version(post)
+    key = (post.id, version)
+    html = html_cache.get(key)
+    if html is None:
+        if post.html_version == version and post.content_html is not None:
+            html = post.content_html
+        else:
+            html = render_markdown(post.content)
+        html_cache.set(key, html)
+    return html
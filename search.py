@@ -0,0 +1,114 @@
+import re
+
+from markupsafe import Markup, escape
+
+from extensions import db
+
+# External-content FTS5 index over post(title, summary, content). The
+# triggers keep it in sync on insert/edit/delete, whatever the write path.
+FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(
+        title, summary, content,
+        content='post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_ai AFTER INSERT ON post BEGIN
+        INSERT INTO post_fts(rowid, title, summary, content)
+        VALUES (new.id, new.title, new.summary, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_ad AFTER DELETE ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, old.summary, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS post_fts_au AFTER UPDATE OF title, summary, content ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, old.summary, old.content);
+        INSERT INTO post_fts(rowid, title, summary, content)
+        VALUES (new.id, new.title, new.summary, new.content);
+    END""",
+]
+
+# bm25() column weights: title, summary, content
+BM25_WEIGHTS = (10.0, 4.0, 1.0)
+SNIPPET_TOKENS = 24
+_HL_START, _HL_END = '\x02', '\x03'
+
+FTS_TRIGGERS = ('post_fts_ai', 'post_fts_ad', 'post_fts_au')
+
+fts = db.table('post_fts', db.column('rowid'))
+_fts_col = db.literal_column('post_fts')
+_available = None
+
+
+def fts_available():
+    global _available
+    if _available is None:
+        if db.engine.dialect.name != 'sqlite':
+            _available = False
+        else:
+            _available = db.session.execute(db.text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'post_fts'"
+            )).first() is not None
+    return _available
+
+
+def index_complete():
+    # The index table can outlive its triggers: SQLite table rebuilds of
+    # post (batch migrations) drop them, and the index silently goes stale
+    if not fts_available():
+        return False
+    names = set(db.session.scalars(db.text(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'post'")))
+    return names.issuperset(FTS_TRIGGERS)
+
+
+def rebuild_index():
+    global _available
+    if db.engine.dialect.name != 'sqlite':
+        return False  # other databases use the LIKE fallback
+    # IF NOT EXISTS: restores whichever of the table and triggers is missing
+    for statement in FTS_SCHEMA:
+        db.session.execute(db.text(statement))
+    db.session.execute(db.text("INSERT INTO post_fts(post_fts) VALUES ('rebuild')"))
+    db.session.commit()
+    _available = True
+    return True
+
+
+def match_expression(text):
+    # Turn free text into a safe FTS5 query: every word must match (as prefix)
+    words = re.findall(r'\w+', text or '')
+    return ' '.join(f'"{w}"*' for w in words)
+
+
+def search_posts(query, text):
+    # Filters/orders an existing Post query (e.g. already filtered by
+    # category). Returns (query, rank): rank is the relevance key for keyset
+    # pagination (lower bm25 is better), None unless the FTS join applied.
+    from models import Post
+    if not fts_available():
+        return query.filter(Post.title.icontains(text) | Post.content.icontains(text)), None
+    expression = match_expression(text)
+    if not expression:
+        return query.filter(db.false()), None
+    rank = db.func.bm25(_fts_col, *BM25_WEIGHTS)
+    return query.join(fts, fts.c.rowid == Post.id) \
+        .filter(_fts_col.op('MATCH')(expression)) \
+        .order_by(rank), rank
+
+
+def snippets(posts, text):
+    # Highlighted content excerpts for one page of results: {post_id: Markup}
+    expression = match_expression(text)
+    if not posts or not expression or not fts_available():
+        return {}
+    rows = db.session.execute(
+        db.select(fts.c.rowid, db.func.snippet(_fts_col, -1, _HL_START, _HL_END, '…', SNIPPET_TOKENS))
+        .select_from(fts)
+        .where(_fts_col.op('MATCH')(expression))
+        .where(fts.c.rowid.in_([p.id for p in posts]))
+    )
+    return {
+        rowid: Markup(str(escape(snippet)).replace(_HL_START, '<mark>').replace(_HL_END, '</mark>'))
+        for rowid, snippet in rows
+    }
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+from extensions import db
+from cache import VersionStamp
+from models import Category, Post, SiteSettings
+
+# Bumped whenever categories, their post counts or site settings change
+layout_stamp = VersionStamp('layout')
+
+_cached = (None, None)
+
+
+def _load():
+    # Read-only: this runs mid-render, so until admin_settings creates the
+    # row a new site gets the column defaults instead of a commit
+    settings = SiteSettings.query.first()
+    site_settings = SimpleNamespace(**{
+        c.name: getattr(settings, c.name) if settings else c.default and c.default.arg
+        for c in SiteSettings.__table__.columns
+    })
+    rows = db.session.query(Category, db.func.count(Post.id)) \
+        .outerjoin(Post, Post.category_id == Category.id) \
+        .group_by(Category.id).order_by(Category.id).all()
+    categories = [
+        SimpleNamespace(id=c.id, name=c.name, slug=c.slug, description=c.description,
+                        color=c.color, post_count=count)
+        for c, count in rows
+    ]
+    return dict(categories=categories, site_settings=site_settings)
+
+
+def get_site_context():
+    # Plain snapshots (not ORM objects), so they are safe to share across requests
+    global _cached
+    stamp = layout_stamp.current()
+    cached_stamp, context = _cached
+    if context is None or cached_stamp != stamp:
+        context = _load()
+        _cached = (stamp, context)
+    return context
+
+
+def invalidate_site_context():
+    layout_stamp.bump()
@@ -0,0 +1,88 @@
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class SQLStats:
+    # Counts and times SQL statements per app context (i.e. per request)
+    # through SQLAlchemy engine events. SQL_QUERY_BUDGET is a number, or a dict of
+    # {endpoint: number}; a request that runs more statements fails under
+    # TESTING and logs a warning otherwise.
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_QUERY_BUDGET', None)
+        self.app = app
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+        app.after_request(self._check_budget)
+
+    def _check_budget(self, response):
+        budget = self.app.config['SQL_QUERY_BUDGET']
+        if isinstance(budget, dict):
+            budget = budget.get(request.endpoint)
+        if budget is not None and query_count() > budget:
+            message = f"{request.endpoint} ran {query_count()} SQL statements (budget: {budget})"
+            if self.app.testing:
+                raise QueryBudgetExceeded(message)
+            self.app.logger.warning(message)
+        return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.sql_count = g.get('sql_count', 0) + 1
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if starts and has_app_context():
+        g.sql_time = g.get('sql_time', 0.0) + time.perf_counter() - starts.pop()
+
+
+def _handle_error(context):
+    starts = context.connection.info.get('query_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def query_count():
+    return g.get('sql_count', 0)
+
+
+def query_time():
+    return g.get('sql_time', 0.0)
+
+
+@contextmanager
+def max_queries(n):
+    # For tests: with max_queries(3): client.get('/blog')
+    # (a test client request runs in its own app context, so count globally)
+    counter = [0]
+
+    def count(*args):
+        counter[0] += 1
+
+    event.listen(Engine, 'before_cursor_execute', count)
+    try:
+        yield counter
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count)
+    if counter[0] > n:
+        raise QueryBudgetExceeded(f"{counter[0]} SQL statements run (budget: {n})")
+
+
+sql_stats = SQLStats()
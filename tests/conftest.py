@@ -0,0 +1,57 @@
+import os
+import tempfile
+
+import pytest
+
+# app.py reads DATABASE_URL at import time
+instance = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(instance, 'test.db')
+
+from app import app as flask_app
+from analytics import analytics_collector
+from counters import view_counter
+from extensions import db
+from models import Post, User
+from ratelimit import rate_limiter
+from user_cache import user_cache
+
+flask_app.config['METRICS_DIR'] = os.path.join(instance, 'metrics')
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setitem(flask_app.config, 'TESTING', True)
+    monkeypatch.setitem(flask_app.config, 'WTF_CSRF_ENABLED', False)
+    monkeypatch.setitem(flask_app.config, 'CACHE_STAMP_DIR', str(tmp_path / 'stamps'))
+    monkeypatch.setitem(flask_app.config, 'RATE_LIMIT_FILE', str(tmp_path / 'ratelimit.bin'))
+    monkeypatch.setattr(rate_limiter, '_pid', None)  # reopen on this test's file
+    with flask_app.app_context():
+        db.create_all()
+        user_cache.invalidate()
+    yield flask_app
+    view_counter.discard()
+    analytics_collector.discard()
+    with flask_app.app_context():
+        db.drop_all()
+
+
+def make_user(username):
+    user = User(username=username, email=f'{username}@example.com')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def make_post(slug):
+    post = Post(title=slug, slug=slug, content='matn')
+    db.session.add(post)
+    db.session.commit()
+    return post.id
+
+
+def client_for(app, user_id, ip='127.0.0.1'):
+    client = app.test_client()
+    client.environ_base['REMOTE_ADDR'] = ip
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+    return client
@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import event
+
+from conftest import client_for, make_post, make_user
+from extensions import db
+from models import Post, User, post_like
+
+
+def like_count():
+    return db.session.scalar(db.select(db.func.count()).select_from(post_like))
+
+
+def test_second_like_is_a_no_op(app):
+    with app.app_context():
+        post_id = make_post('birinchi')
+        user_id = make_user('alice')
+    client = client_for(app, user_id)
+    assert client.post('/post/birinchi/like').get_json()['likes'] == 1
+    assert client.post('/post/birinchi/like').get_json()['likes'] == 1
+    with app.app_context():
+        assert like_count() == 1
+        assert db.session.get(Post, post_id).likes == 1
+        assert db.session.get(User, user_id).points == 1
+
+
+def test_failed_counter_update_leaves_no_like(app):
+    with app.app_context():
+        post_id = make_post('birinchi')
+        user_id = make_user('alice')
+        engine = db.engine
+
+    def fail_counter_update(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE post SET'):
+            raise RuntimeError('counter update failed')
+
+    event.listen(engine, 'before_cursor_execute', fail_counter_update)
+    try:
+        with pytest.raises(RuntimeError):
+            client_for(app, user_id).post('/post/birinchi/like')
+    finally:
+        event.remove(engine, 'before_cursor_execute', fail_counter_update)
+
+    with app.app_context():
+        assert like_count() == 0
+        assert db.session.get(Post, post_id).likes == 0
@@ -0,0 +1,30 @@
+from conftest import client_for, make_post, make_user
+from ratelimit import parse_limit, rate_limiter
+
+
+def setup_likes(app, monkeypatch, users):
+    monkeypatch.setitem(rate_limiter._limits, 'like_post', parse_limit('2/minute'))
+    with app.app_context():
+        for slug in ('birinchi', 'ikkinchi', 'uchinchi'):
+            make_post(slug)
+        return [make_user(name) for name in users]
+
+
+def test_logged_in_users_share_their_ip_budget(app, monkeypatch):
+    alice, bob = setup_likes(app, monkeypatch, ['alice', 'bob'])
+    client = client_for(app, alice)
+    assert client.post('/post/birinchi/like').status_code == 200
+    assert client.post('/post/ikkinchi/like').status_code == 200
+
+    # Bob's own bucket is full, but the IP's is not
+    response = client_for(app, bob).post('/post/uchinchi/like')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert client_for(app, bob, ip='10.0.0.2').post('/post/uchinchi/like').status_code == 200
+
+
+def test_user_budget_follows_the_user_across_ips(app, monkeypatch):
+    alice, = setup_likes(app, monkeypatch, ['alice'])
+    assert client_for(app, alice, ip='10.0.0.1').post('/post/birinchi/like').status_code == 200
+    assert client_for(app, alice, ip='10.0.0.2').post('/post/ikkinchi/like').status_code == 200
+    assert client_for(app, alice, ip='10.0.0.3').post('/post/uchinchi/like').status_code == 429
@@ -0,0 +1,182 @@
+import base64
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from werkzeug.utils import secure_filename
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MEDIA_EXTENSIONS = {
+    'videos': {'mp4', 'mov', 'avi'},
+    'audio': {'mp3', 'wav', 'ogg', 'm4a', 'flac', 'aac'},
+}
+READ_SIZE = 64 * 1024
+STALE_AFTER = 24 * 3600  # unfinished uploads are dropped after a day
+
+
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def _exclusive(f):
+    # One writer per upload: flock across workers; without fcntl there is a
+    # single server process, so a thread lock does
+    if fcntl is None:
+        with _write_lock:
+            yield
+    else:
+        fcntl.flock(f, fcntl.LOCK_EX)  # released when f is closed
+        yield
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class ChunkedUploads:
+    # Resumable uploads for post media. State lives next to the data in
+    # UPLOAD_FOLDER/.partial (<id>.part + <id>.json), so any gunicorn worker
+    # can take the next chunk; a chunk is streamed straight to disk.
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024)
+        app.config.setdefault('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+        self.app = app
+
+    @property
+    def folder(self):
+        return os.path.join(self.app.config['UPLOAD_FOLDER'], '.partial')
+
+    def _paths(self, upload_id):
+        if not re.fullmatch(r'[0-9a-f]{32}', upload_id or ''):
+            raise UploadError('Yuklash topilmadi', 404)
+        base = os.path.join(self.folder, upload_id)
+        return base + '.part', base + '.json'
+
+    def _meta(self, upload_id):
+        part, meta = self._paths(upload_id)
+        try:
+            with open(meta) as f:
+                info = json.load(f)
+        except FileNotFoundError:
+            raise UploadError('Yuklash topilmadi', 404)
+        info['offset'] = os.path.getsize(part)
+        return info
+
+    def create(self, kind, filename, size, checksum=None):
+        if kind not in MEDIA_EXTENSIONS:
+            raise UploadError("Noma'lum fayl turi")
+        name = secure_filename(filename or '')
+        ext = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+        if ext not in MEDIA_EXTENSIONS[kind]:
+            raise UploadError(f"Ruxsat etilmagan format: {', '.join(sorted(MEDIA_EXTENSIONS[kind]))}")
+        if not isinstance(size, int) or size <= 0 or size > self.app.config['UPLOAD_MAX_SIZE']:
+            raise UploadError('Fayl hajmi noto\'g\'ri yoki juda katta', 413)
+        # checksum: optional sha256 of the whole file, as hex
+        if checksum is not None and not (isinstance(checksum, str) and re.fullmatch(r'[0-9a-fA-F]{64}', checksum)):
+            raise UploadError('Nazorat summasi noto\'g\'ri (sha256 hex kutilgan)')
+        self.cleanup()
+        os.makedirs(self.folder, exist_ok=True)
+        upload_id = os.urandom(16).hex()
+        part, meta = self._paths(upload_id)
+        open(part, 'wb').close()
+        with open(meta, 'w') as f:
+            json.dump({'id': upload_id, 'kind': kind, 'filename': name, 'size': size,
+                       'checksum': checksum and checksum.lower(), 'created': time.time()}, f)
+        return self.status(upload_id)
+
+    def status(self, upload_id):
+        info = self._meta(upload_id)
+        return {'id': upload_id, 'offset': info['offset'], 'size': info['size'],
+                'chunk_size': self.app.config['UPLOAD_CHUNK_SIZE']}
+
+    def write_chunk(self, upload_id, offset, stream, checksum=None):
+        # checksum: optional "sha256=<base64>" of this chunk (Upload-Checksum)
+        part, _ = self._paths(upload_id)
+        info = self._meta(upload_id)
+        with open(part, 'r+b') as f, _exclusive(f):
+            current = os.fstat(f.fileno()).st_size
+            if offset != current:
+                raise UploadError(f'Offset mos emas (kutilgan: {current})', 409)
+            f.seek(offset)
+            digest = hashlib.sha256()
+            written = 0
+            try:
+                while True:
+                    data = stream.read(READ_SIZE)
+                    if not data:
+                        break
+                    written += len(data)
+                    if offset + written > info['size']:
+                        raise UploadError('Fayl e\'lon qilingan hajmdan katta', 413)
+                    digest.update(data)
+                    f.write(data)
+                if checksum and checksum != 'sha256=' + base64.b64encode(digest.digest()).decode():
+                    raise UploadError('Bo\'lak nazorat summasi mos emas', 460)
+                f.flush()
+                os.fsync(f.fileno())
+            except Exception:
+                # Bad or oversized chunk, client gone, disk full: drop what
+                # this chunk wrote, so the offset stays at the last good chunk
+                f.truncate(offset)
+                raise
+        return self.status(upload_id)
+
+    def complete(self, upload_id):
+        # Verifies size and whole-file checksum, then moves the file into
+        # UPLOAD_FOLDER/<kind>/; returns (kind, stored filename)
+        part, meta = self._paths(upload_id)
+        info = self._meta(upload_id)
+        if info['offset'] != info['size']:
+            raise UploadError('Yuklash hali tugamagan', 409)
+        if info.get('checksum'):
+            digest = hashlib.sha256()
+            with open(part, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            if info['checksum'].lower() != digest.hexdigest():
+                raise UploadError('Fayl nazorat summasi mos emas', 460)
+        target_dir = os.path.join(self.app.config['UPLOAD_FOLDER'], info['kind'])
+        os.makedirs(target_dir, exist_ok=True)
+        stem, ext = os.path.splitext(info['filename'])
+        filename = f"{stem}-{os.urandom(4).hex()}{ext}"
+        os.replace(part, os.path.join(target_dir, filename))
+        os.remove(meta)
+        return info['kind'], filename
+
+    def is_finished(self, kind, filename):
+        # For form submissions referring to a completed upload
+        name = secure_filename(filename or '')
+        return bool(name) and name == filename and kind in MEDIA_EXTENSIONS and \
+            os.path.isfile(os.path.join(self.app.config['UPLOAD_FOLDER'], kind, name))
+
+    def cleanup(self):
+        cutoff = time.time() - STALE_AFTER
+        for meta in glob.glob(os.path.join(self.folder, '*.json')):
+            part = meta[:-5] + '.part'
+            last_write = os.path.getmtime(part if os.path.exists(part) else meta)
+            if last_write < cutoff:
+                for path in (meta, part):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+
+chunked_uploads = ChunkedUploads()
@@ -0,0 +1,60 @@
+import time
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from cache import LRUCache, VersionStamp
+from extensions import db
+from models import User
+
+# Bumped when users change in bulk (import-data); single users have
+# their own stamp, see UserCache.invalidate
+user_stamp = VersionStamp('users')
+
+
+def _user_stamp(user_id):
+    return VersionStamp(f'user-{user_id}')
+
+
+class UserCache:
+    # Identity cache for Flask-Login's user loader. Each worker keeps a
+    # detached copy of the user's columns for USER_CACHE_TTL seconds and
+    # merges it into the request's session without a query; relationships
+    # (badges, posts, comments) load only when accessed. A change to a user
+    # bumps that user's stamp file, which drops every worker's copy of them
+    # (and only them); checking it is a stat() per request.
+    def __init__(self, app=None):
+        self.ttl = 60
+        self._users = LRUCache(maxsize=1024)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('USER_CACHE_TTL', 60)
+        app.config.setdefault('USER_CACHE_SIZE', 1024)
+        self.ttl = app.config['USER_CACHE_TTL']
+        self._users.maxsize = app.config['USER_CACHE_SIZE']
+
+    def load(self, user_id):
+        stamp = (user_stamp.current(), _user_stamp(user_id).current())
+        now = time.monotonic()
+        entry = self._users.get(user_id)
+        if entry is not None and entry[0] == stamp and entry[1] > now:
+            return db.session.merge(entry[2], load=False)
+        user = db.session.get(User, user_id)
+        if user is not None and self.ttl > 0:
+            copy = User(**{attr.key: getattr(user, attr.key) for attr in User.__mapper__.column_attrs})
+            make_transient_to_detached(copy)
+            self._users.set(user_id, (stamp, now + self.ttl, copy))
+        return user
+
+    def invalidate(self, user_id=None):
+        # Call after committing a change to a user; None: all users
+        if user_id is None:
+            self._users.clear()
+            user_stamp.bump()
+        else:
+            self._users.pop(user_id)
+            _user_stamp(user_id).bump()
+
+
+user_cache = UserCache()